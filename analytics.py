@@ -0,0 +1,72 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import Date, cast, func, literal_column
+from sqlalchemy.future import select
+from models import Video
+
+# Video analytics aggregated in SQL. Results are compact parallel arrays whose
+# size depends on the date range and number of statuses, never on row count.
+
+BUCKETS = ('day', 'week', 'month')
+
+def bucket_expression(dialect_name, bucket, column):
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket!r}")
+    if dialect_name == 'postgresql':
+        return cast(func.date_trunc(bucket, column), Date)
+    if bucket == 'day':
+        return func.date(column)
+    if bucket == 'week':
+        # Monday of the row's ISO week.
+        return func.date(column, literal_column("'weekday 0'"), literal_column("'-6 days'"))
+    return func.strftime('%Y-%m-01', column)
+
+def _date_filters(query, start, end):
+    if start:
+        query = query.where(Video.created_at >= datetime.combine(start, datetime.min.time()))
+    if end:
+        query = query.where(Video.created_at < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return query
+
+def _as_date(value):
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+def _next_bucket(day, bucket):
+    if bucket == 'day':
+        return day + timedelta(days=1)
+    if bucket == 'week':
+        return day + timedelta(weeks=1)
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+def _zero_fill(rows, bucket):
+    counts = {_as_date(day): count for day, count in rows}
+    if not counts:
+        return [], []
+    days, values = [], []
+    day, last = min(counts), max(counts)
+    while day <= last:
+        days.append(day.isoformat())
+        values.append(counts.get(day, 0))
+        day = _next_bucket(day, bucket)
+    return days, values
+
+async def submission_counts(session, bucket='day', start=None, end=None):
+    """Return {'buckets': [...], 'counts': [...]} of videos submitted per bucket, gaps filled with 0."""
+    period = bucket_expression(session.bind.dialect.name, bucket, Video.created_at).label('period')
+    query = _date_filters(select(period, func.count(Video.id)), start, end) \
+        .where(Video.created_at.isnot(None)) \
+        .group_by(period) \
+        .order_by(period)
+    result = await session.execute(query)
+    buckets, counts = _zero_fill(result.all(), bucket)
+    return {'buckets': buckets, 'counts': counts}
+
+async def status_counts(session, start=None, end=None):
+    """Return {'statuses': [...], 'counts': [...]} of videos per status."""
+    query = _date_filters(select(Video.status, func.count(Video.id)), start, end) \
+        .group_by(Video.status) \
+        .order_by(func.count(Video.id).desc())
+    result = await session.execute(query)
+    rows = result.all()
+    return {'statuses': [status for status, _ in rows], 'counts': [count for _, count in rows]}
@@ -0,0 +1,113 @@
+"""Run cluster.py against a fake gateway and check sharding and leader election.
+
+    python benchmarks/bench_cluster.py --processes 3 --shards 6
+
+Starts the coordinator on a seeded scratch database, then checks that every
+shard identifies exactly once, that exactly one process polls GitHub, and that
+another process takes over polling within a few lease periods after the
+leader is killed. Reports how long startup and failover took; exits non-zero
+if a check fails.
+"""
+import argparse
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness
+from fake_gateway import FakeGateway
+
+def wait_for(condition, timeout, interval=0.2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = condition()
+        if result:
+            return result
+        time.sleep(interval)
+    return None
+
+def lease_holder(database):
+    conn = sqlite3.connect(database, timeout=10)
+    try:
+        row = conn.execute(
+            "SELECT holder FROM leases WHERE name = 'github_issues' AND expires_at > ?",
+            (time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()),)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        conn.close()
+    return row[0] if row and row[0] else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=3)
+    parser.add_argument('--shards', type=int, default=6)
+    parser.add_argument('--lease-seconds', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=120)
+    args = parser.parse_args()
+
+    workdir = harness.prepare_environment(harness.SIZES['1k'])
+    database = os.path.join(workdir, 'videos.db')
+    gateway = FakeGateway(recommended_shards=args.shards).start()
+    env = {
+        **os.environ,
+        'DISCORD_TOKEN': 'fake-token',
+        'DISCORD_API_URL': gateway.api_url,
+        'DISCORD_GATEWAY_URL': gateway.gateway_url,
+        'GITHUB_API_URL': gateway.github_url,
+        'LEADER_LEASE_SECONDS': str(args.lease_seconds),
+    }
+    started = time.monotonic()
+    cluster = subprocess.Popen(
+        [sys.executable, os.path.join(harness.ROOT, 'cluster.py'), '--processes', str(args.processes),
+         '--shards', str(args.shards), '--identify-interval', '0'],
+        env=env, start_new_session=True
+    )
+    failures = []
+
+    def check(ok, message):
+        print(f"{'ok  ' if ok else 'FAIL'} {message}", file=sys.stderr)
+        if not ok:
+            failures.append(message)
+
+    try:
+        all_identified = wait_for(lambda: len(gateway.snapshot()[0]) == args.shards, args.timeout)
+        identified, shard_counts, _ = gateway.snapshot()
+        check(all_identified, f"all {args.shards} shards identified in {time.monotonic() - started:.1f}s")
+        check(all(count == 1 for count in identified.values()), f"each shard identified once: {identified}")
+        check(shard_counts == {args.shards}, f"every IDENTIFY used shard_count {args.shards}: {shard_counts}")
+
+        holder = wait_for(lambda: lease_holder(database), args.timeout)
+        check(holder is not None, f"leader elected: {holder}")
+        wait_for(lambda: gateway.snapshot()[2] >= 1, args.timeout)
+        time.sleep(args.lease_seconds * 3)
+        polls = gateway.snapshot()[2]
+        check(polls == 1, f"GitHub polled once by {args.processes} processes, got {polls}")
+
+        if holder:
+            killed = time.monotonic()
+            os.kill(int(holder.rsplit(':', 1)[1]), signal.SIGKILL)
+            new_holder = wait_for(lambda: (lease_holder(database) or holder) != holder and lease_holder(database),
+                                  args.lease_seconds * 5)
+            check(new_holder is not None, f"leadership moved to {new_holder} in {time.monotonic() - killed:.1f}s")
+            check(wait_for(lambda: gateway.snapshot()[2] == 2, args.lease_seconds * 5) is not None,
+                  f"new leader polled GitHub once (total polls {gateway.snapshot()[2]})")
+            check(wait_for(lambda: sum(gateway.snapshot()[0].values()) > args.shards, args.timeout) is not None,
+                  "killed process restarted and re-identified its shards")
+    finally:
+        cluster.send_signal(signal.SIGINT)
+        try:
+            cluster.wait(60)
+        except subprocess.TimeoutExpired:
+            os.killpg(cluster.pid, signal.SIGKILL)
+        gateway.stop()
+
+    check(lease_holder(database) is None, "lease released on shutdown")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Measure read/write contention on the shared database under each DB_PROFILE.
+
+N writer and M reader tasks are spread over several processes (like the bot
+and the web interface sharing videos.db) and run for a fixed time against a
+scratch copy of a seeded database:
+
+    python benchmarks/bench_contention.py --writers 8 --readers 16 --processes 2 --duration 10 \\
+        --profiles default compat [--json results.json]
+
+Reports throughput, p50/p99 latency and errors (e.g. "database is locked") for reads and writes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness
+
+async def run_tasks(worker, writers, readers, duration, videos):
+    from database import (
+        add_video, close_db, find_videos, get_recent_videos, get_top_makers, get_video, set_editor_rating
+    )
+    rng = random.Random(worker)
+    latencies = {'read': [], 'write': []}
+    errors = Counter()
+    deadline = time.monotonic() + duration
+
+    async def write(n):
+        if n % 2:
+            await set_editor_rating(harness.editor_id(rng.randrange(harness.EDITORS)),
+                                    harness.maker_id(rng.randrange(harness.MAKERS)), rng.randint(1, 5))
+        else:
+            await add_video(title=harness.random_text(rng, 4).title(), description=harness.random_text(rng, 30),
+                            maker=harness.maker_id(rng.randrange(harness.MAKERS)),
+                            gdrive_link=f"https://drive.google.com/file/d/contention-{worker}-{n}", status='submitted')
+
+    async def read(n):
+        kind = n % 4
+        if kind == 0:
+            await get_top_makers(10)
+        elif kind == 1:
+            await get_recent_videos(harness.maker_id(rng.randrange(harness.MAKERS)))
+        elif kind == 2:
+            await find_videos(rng.choice(harness.WORDS), 10, 0)
+        else:
+            await get_video(rng.randrange(videos) + 1)
+
+    async def loop(kind, operation):
+        n = 0
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                await operation(n)
+            except Exception as e:
+                errors[f"{kind}: {str(e).splitlines()[0][:80]}"] += 1
+            else:
+                latencies[kind].append(time.perf_counter() - started)
+            n += 1
+
+    await asyncio.gather(*[loop('write', write) for _ in range(writers)],
+                         *[loop('read', read) for _ in range(readers)])
+    await close_db()
+    return latencies, errors
+
+def split(total, parts, index):
+    return total // parts + (1 if index < total % parts else 0)
+
+def run_worker(args):
+    sys.path.insert(0, harness.ROOT)
+    latencies, errors = asyncio.run(run_tasks(
+        args.worker, split(args.writers, args.processes, args.worker), split(args.readers, args.processes, args.worker),
+        args.duration, harness.SIZES[args.size]
+    ))
+    print(json.dumps({'latencies': latencies, 'errors': errors}))
+
+def run_profile(profile, args):
+    workdir = harness.prepare_environment(harness.SIZES[args.size])
+    env = {**os.environ, 'DB_PROFILE': profile}
+    command = [sys.executable, os.path.abspath(__file__), '--size', args.size, '--writers', str(args.writers),
+               '--readers', str(args.readers), '--processes', str(args.processes), '--duration', str(args.duration)]
+    workers = [subprocess.Popen(command + ['--worker', str(n)], env=env, stdout=subprocess.PIPE, text=True)
+               for n in range(args.processes)]
+    latencies = {'read': [], 'write': []}
+    errors = Counter()
+    for worker in workers:
+        output = json.loads(worker.communicate()[0].strip().splitlines()[-1])
+        for kind in latencies:
+            latencies[kind].extend(output['latencies'][kind])
+        errors.update(output['errors'])
+
+    results = {}
+    for kind, values in latencies.items():
+        kind_errors = sum(count for message, count in errors.items() if message.startswith(kind))
+        results[kind] = harness.summarize(values, kind_errors, args.duration, harness.rss_mb())
+        stats = results[kind]
+        print(f"{profile:8} {kind:5} {stats['throughput']:7.0f} ops/s  p50 {stats['p50_ms'] or 0:7.1f} ms  "
+              f"p99 {stats['p99_ms'] or 0:7.1f} ms  {kind_errors} errors", file=sys.stderr)
+    for message, count in errors.most_common(5):
+        print(f"    {count} x {message}", file=sys.stderr)
+    results['errors'] = dict(errors)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=harness.SIZES, default='1k')
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=16)
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--profiles', nargs='+', default=['default', 'compat'])
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        run_worker(args)
+        return
+
+    results = {profile: run_profile(profile, args) for profile in args.profiles}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'meta': vars(args), 'results': results}, f, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""Drive the bot's slash commands and the web routes under concurrent load.
+
+Each database size runs in its own interpreter, against a scratch copy of a
+seeded SQLite database (built once under benchmarks/data/):
+
+    python benchmarks/bench_load.py --sizes 1k 100k --requests 500 --concurrency 20 \\
+        --json results.json [--compare baseline.json --tolerance 0.25]
+
+With --compare, the run fails if any scenario's p99 latency grew by more than
+the tolerance or it raised more errors than in the baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness
+
+async def bot_scenarios(videos, total, concurrency):
+    import bot
+    harness.install_fake_client(bot.bot)
+    commands = {command.name: command for command in bot.bot.tree.get_commands()}
+
+    def interaction(n, administrator=False):
+        return harness.FakeInteraction(harness.FakeUser(harness.maker_id(n % harness.MAKERS), administrator))
+
+    async def submit_video(n):
+        first = interaction(n)
+        await commands['submit_video'].callback(first)
+        modal = first.response.modal
+        modal.video_title._value = f"Benchmark video {n}"
+        modal.description._value = harness.random_text(random.Random(n), 20)
+        modal.gdrive_link._value = f"https://drive.google.com/file/d/bench-{n}"
+        await modal.on_submit(interaction(n))
+
+    async def rate_editor(n):
+        first = interaction(n)
+        await commands['rate_editor'].callback(first, harness.FakeUser(harness.editor_id(n % harness.EDITORS)))
+        select = first.response.sent[-1][1]['view'].children[0]
+        select._values = [str(n % 5 + 1)]
+        await select.callback(interaction(n))
+
+    scenarios = {
+        'bot.submit_video': submit_video,
+        'bot.rate_editor': rate_editor,
+        'bot.leaderboard': lambda n: commands['leaderboard'].callback(interaction(n)),
+        'bot.editor_leaderboard': lambda n: commands['editor_leaderboard'].callback(interaction(n)),
+        'bot.video_status': lambda n: commands['video_status'].callback(interaction(n)),
+        'bot.video_info': lambda n: commands['video_info'].callback(interaction(n), n * 7919 % videos + 1),
+        'bot.search_videos': lambda n: commands['search_videos'].callback(
+            interaction(n), harness.WORDS[n % len(harness.WORDS)]),
+        'bot.video_analytics': lambda n: commands['video_analytics'].callback(interaction(n)),
+    }
+    results = {}
+    for name, call in scenarios.items():
+        results[name] = await harness.run_async_load(call, total, concurrency)
+        print(f"{name}: {format_stats(results[name])}", file=sys.stderr)
+    await bot.shutdown()
+    return results
+
+def web_scenarios(videos, total, concurrency):
+    import threading
+    import web_interface
+
+    local = threading.local()
+
+    def get(path):
+        def call(n):
+            if not hasattr(local, 'client'):
+                local.client = web_interface.app.test_client()
+            response = local.client.get(path(n))
+            if response.status_code >= 400:
+                raise RuntimeError(f"{path(n)} returned {response.status_code}")
+        return call
+
+    scenarios = {
+        'web.index': get(lambda n: '/'),
+        'web.leaderboard': get(lambda n: f"/leaderboard?page={n % 10 + 1}"),
+        'web.api_videos': get(lambda n: '/api/videos?limit=50'),
+        'web.search': get(lambda n: f"/search?q={harness.WORDS[n % len(harness.WORDS)]}"),
+        'web.api_search': get(lambda n: f"/api/search?q={harness.WORDS[n % len(harness.WORDS)]}"),
+        'web.video_detail': get(lambda n: f"/video/{n * 7919 % videos + 1}"),
+    }
+    results = {}
+    for name, call in scenarios.items():
+        results[name] = harness.run_threaded_load(call, total, concurrency)
+        print(f"{name}: {format_stats(results[name])}", file=sys.stderr)
+    return results
+
+def format_stats(stats):
+    if stats['p50_ms'] is None:
+        return f"all {stats['errors']} requests failed"
+    return (f"{stats['throughput']:.0f}/s, p50 {stats['p50_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms, "
+            f"{stats['errors']} errors, RSS {stats['rss_mb']:.0f} MB")
+
+def run_one(args):
+    videos = harness.SIZES[args.run_one]
+    workdir = harness.prepare_environment(videos)
+    results = {}
+    if args.target in ('bot', 'all'):
+        results.update(asyncio.run(bot_scenarios(videos, args.requests, args.concurrency)))
+    if args.target in ('web', 'all'):
+        results.update(web_scenarios(videos, args.requests, args.web_concurrency))
+    shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps(results))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', choices=harness.SIZES, default=['1k'])
+    parser.add_argument('--target', choices=['bot', 'web', 'all'], default='all')
+    parser.add_argument('--requests', type=int, default=200, help="Requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=10, help="Concurrent slash commands")
+    parser.add_argument('--web-concurrency', type=int, default=4, help="Concurrent web clients")
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--compare', help="Baseline results file to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--run-one', choices=harness.SIZES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        run_one(args)
+        return
+
+    results = {}
+    for size in args.sizes:
+        print(f"== {size} videos ==", file=sys.stderr)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run-one', size, '--target', args.target,
+             '--requests', str(args.requests), '--concurrency', str(args.concurrency),
+             '--web-concurrency', str(args.web_concurrency)],
+            stdout=subprocess.PIPE, text=True, check=True
+        ).stdout
+        results[size] = json.loads(output.strip().splitlines()[-1])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'meta': {
+                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                    'python': platform.python_version(),
+                    'requests': args.requests,
+                    'concurrency': args.concurrency,
+                    'web_concurrency': args.web_concurrency,
+                },
+                'results': results,
+            }, f, indent=4)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = harness.compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Measure web login latency under a login storm, and what the storm does to other requests.
+
+Each setup is served by a threaded WSGI server in its own process, against a
+scratch copy of a seeded database with --users accounts. Concurrent clients
+log in while others keep loading /api/videos, then a logged-in client loads a
+page that only needs the session:
+
+    python benchmarks/bench_login.py --logins 200 --concurrency 16 --rounds 12 [--json results.json]
+
+Setups: inline (HASH_WORKERS=0, hashing on the event loop as before),
+pool (the default worker processes) and pool-no-session-cache (SESSION_CACHE_TTL=0).
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import re
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness
+from bench_web_modes import free_port, wait_until_up
+
+SETUPS = {
+    'inline': {'HASH_WORKERS': '0'},
+    'pool': {},
+    'pool-no-session-cache': {'SESSION_CACHE_TTL': '0'},
+}
+CSRF_TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+def serve(size, port, users, rounds):
+    workdir = harness.prepare_environment(harness.SIZES[size])
+    os.environ['BCRYPT_ROUNDS'] = str(rounds)
+    from credentials import _hash
+    password_hash = _hash('bench-password', rounds)
+    with sqlite3.connect(os.path.join(workdir, 'videos.db')) as conn:
+        conn.executemany('INSERT INTO user (username, password_hash) VALUES (?, ?)',
+                         [(f"bench-user-{n}", password_hash) for n in range(users)])
+    from werkzeug.serving import make_server
+    import web_interface
+    import logging
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    try:
+        make_server('127.0.0.1', port, web_interface.app, threaded=True).serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+def login(base, username):
+    """Log in as username and return (seconds the POST took, opener holding the session cookie)."""
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect)
+    with opener.open(base + '/login', timeout=120) as response:
+        token = CSRF_TOKEN.search(response.read().decode()).group(1)
+    data = urllib.parse.urlencode({'csrf_token': token, 'username': username, 'password': 'bench-password'})
+    started = time.perf_counter()
+    try:
+        opener.open(base + '/login', data.encode(), timeout=120).read()
+        raise RuntimeError(f"login as {username} was rejected")
+    except urllib.error.HTTPError as e:
+        if e.code != 302:
+            raise
+    return time.perf_counter() - started, opener
+
+def bench_setup(name, args):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', '--size', args.size, '--port', str(port),
+         '--users', str(args.users), '--rounds', str(args.rounds)],
+        env={**os.environ, **SETUPS[name]}, stdout=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{port}"
+    results = {}
+    try:
+        wait_until_up(base + '/metrics')
+        login(base, 'bench-user-0')  # warm-up
+
+        # Bystanders keep loading a page while the storm runs.
+        storm_over = threading.Event()
+        bystander_latencies = []
+
+        def bystander():
+            while not storm_over.is_set():
+                started = time.perf_counter()
+                with urllib.request.urlopen(base + '/api/videos?limit=50', timeout=120) as response:
+                    response.read()
+                bystander_latencies.append(time.perf_counter() - started)
+
+        bystanders = [threading.Thread(target=bystander) for _ in range(args.bystanders)]
+        for thread in bystanders:
+            thread.start()
+        login_latencies = []
+        def storm(n):
+            login_latencies.append(login(base, f"bench-user-{n % args.users}")[0])
+        storm = harness.run_threaded_load(storm, args.logins, args.concurrency)
+        storm_over.set()
+        for thread in bystanders:
+            thread.join()
+        elapsed = storm['requests'] / storm['throughput']
+        results['login'] = harness.summarize(login_latencies, storm['errors'], elapsed, harness.rss_mb())
+        results['bystander'] = harness.summarize(bystander_latencies, 0, elapsed, harness.rss_mb())
+
+        _, opener = login(base, 'bench-user-0')
+        def browse(n):
+            with opener.open(base + '/submit_video', timeout=30) as response:
+                response.read()
+        results['browse'] = harness.run_threaded_load(browse, args.logins * 5, args.concurrency)
+
+        for kind in ('login', 'bystander', 'browse'):
+            stats = results[kind]
+            print(f"{name:22} {kind:10} p50 {stats['p50_ms'] or 0:8.1f} ms  p99 {stats['p99_ms'] or 0:8.1f} ms  "
+                  f"{stats['errors']} errors", file=sys.stderr)
+    finally:
+        server.send_signal(signal.SIGINT)  # lets the hash pool shut its workers down
+        server.wait()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=harness.SIZES, default='1k')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--bystanders', type=int, default=2)
+    parser.add_argument('--rounds', type=int, default=12, help="BCRYPT_ROUNDS for the accounts and the server")
+    parser.add_argument('--setups', nargs='+', choices=SETUPS, default=list(SETUPS))
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.size, args.port, args.users, args.rounds)
+        return
+
+    harness.seed_database(harness.SIZES[args.size])
+    results = {name: bench_setup(name, args) for name in args.setups}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'meta': vars(args), 'results': results}, f, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Measure cold import time and peak RSS of the bot and web entry points.
+
+Each module is imported in a fresh interpreter, several times, from the
+repository root:
+
+    python benchmarks/bench_startup.py [--runs 5] [--json results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ['bot', 'web_interface']
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+heavy = sorted(name for name in ('matplotlib', 'pandas', 'plotly', 'googleapiclient', 'github') if name in sys.modules)
+print(json.dumps({{'seconds': elapsed, 'rss_mb': rss_kb / 1024, 'heavy_modules': heavy}}))
+"""
+
+def measure(module):
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for module in MODULES:
+        runs = [measure(module) for _ in range(args.runs)]
+        results[module] = {
+            'median_seconds': statistics.median(run['seconds'] for run in runs),
+            'max_rss_mb': max(run['rss_mb'] for run in runs),
+            'heavy_modules': runs[-1]['heavy_modules'],
+        }
+        print(f"{module}: import {results[module]['median_seconds'] * 1000:.0f} ms (median of {args.runs}), "
+              f"peak RSS {results[module]['max_rss_mb']:.1f} MB, "
+              f"heavy modules loaded: {', '.join(results[module]['heavy_modules']) or 'none'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Measure the thumbnail pipeline: renditions made per second in the worker pool, cache hits, and serving.
+
+Generates --images 1920x1080 source images, runs them through
+thumbnails.prepare_thumbnail twice (cold, then from the cache), then loads
+their web renditions through the /thumbnails route:
+
+    python benchmarks/bench_thumbnails.py --images 50 --concurrency 8 [--json results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness
+
+def make_sources(directory, count):
+    from PIL import Image
+    paths = []
+    for n in range(count):
+        path = os.path.join(directory, f"source-{n}.png")
+        image = Image.effect_noise((480, 270), 40 + n % 50).convert('RGB').resize((1920, 1080))
+        image.save(path)
+        paths.append(path)
+    return paths
+
+async def process_all(paths, concurrency):
+    from thumbnails import prepare_thumbnail
+    digests = {}
+
+    async def call(n):
+        digests[n] = await prepare_thumbnail(paths[n])
+
+    return await harness.run_async_load(call, len(paths), concurrency), digests
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args()
+
+    workdir = harness.prepare_environment(harness.SIZES['1k'])
+    os.environ['THUMBNAIL_DIR'] = os.path.join(workdir, 'thumbnails')
+    paths = make_sources(workdir, args.images)
+
+    results = {}
+    results['cold'], digests = asyncio.run(process_all(paths, args.concurrency))
+    results['warm'], _ = asyncio.run(process_all(paths, args.concurrency))
+
+    import web_interface
+    client = web_interface.app.test_client()
+    def fetch(n):
+        response = client.get(f"/thumbnails/{digests[n % args.images]}/{'small' if n % 2 else 'large'}.jpg")
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+    results['serve'] = harness.run_threaded_load(fetch, args.requests, args.concurrency)
+
+    for name, stats in results.items():
+        print(f"{name:6} {stats['throughput']:8.1f} ops/s  p50 {stats['p50_ms'] or 0:8.1f} ms  "
+              f"p99 {stats['p99_ms'] or 0:8.1f} ms  {stats['errors']} errors", file=sys.stderr)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'meta': vars(args), 'results': results}, f, indent=4)
+
+if __name__ == '__main__':
+    main()
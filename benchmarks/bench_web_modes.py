@@ -0,0 +1,101 @@
+"""Compare requests/sec of the web interface under each WEB_EVENT_LOOP mode (shared, per-request, sync).
+
+Each mode is served by a threaded WSGI server in its own process, against a
+scratch copy of a seeded database, and loaded over HTTP:
+
+    python benchmarks/bench_web_modes.py --size 100k --requests 2000 --concurrency 16 [--json results.json]
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness
+
+MODES = ['shared', 'per-request', 'sync']
+ROUTES = {
+    'index': '/',
+    'leaderboard': '/leaderboard',
+    'api_videos': '/api/videos?limit=50',
+}
+
+def serve(mode, size, port):
+    harness.prepare_environment(harness.SIZES[size])
+    os.environ['WEB_EVENT_LOOP'] = mode
+    from werkzeug.serving import make_server
+    import web_interface
+    import logging
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
+    make_server('127.0.0.1', port, web_interface.app, threaded=True).serve_forever()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_until_up(url, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=5).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+def bench_mode(mode, args):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', mode, '--size', args.size, '--port', str(port)],
+        stdout=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{port}"
+    results = {}
+    try:
+        wait_until_up(base + '/metrics')
+        for name, path in ROUTES.items():
+            def call(n, url=base + path):
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    response.read()
+            harness.run_threaded_load(call, min(args.requests, 50), args.concurrency)  # warm-up
+            results[name] = harness.run_threaded_load(call, args.requests, args.concurrency)
+            stats = results[name]
+            print(f"{mode:12} {name:12} {stats['throughput']:7.0f} req/s  p50 {stats['p50_ms'] or 0:7.1f} ms  "
+                  f"p99 {stats['p99_ms'] or 0:7.1f} ms  {stats['errors']} errors", file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=harness.SIZES, default='1k')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--serve', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.size, args.port)
+        return
+
+    harness.seed_database(harness.SIZES[args.size])
+    results = {mode: bench_mode(mode, args) for mode in args.modes}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'meta': {'size': args.size, 'requests': args.requests, 'concurrency': args.concurrency},
+                'results': results,
+            }, f, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""A local stand-in for the Discord gateway, REST API and GitHub API, for running bot processes offline.
+
+It implements just enough for discord.py to log in, identify its shards and
+sync commands, and records every IDENTIFY and GitHub poll so a test can check
+which shards connected and how often the issue poller ran.
+"""
+import asyncio
+import json
+import threading
+from collections import Counter
+from aiohttp import WSMsgType, web
+
+APPLICATION_ID = '100000000000000001'
+BOT_USER = {'id': APPLICATION_ID, 'username': 'video-manager', 'discriminator': '0', 'avatar': None, 'bot': True}
+
+def json_response(data, headers=None):
+    # discord.py only decodes responses whose Content-Type is exactly application/json.
+    return web.Response(body=json.dumps(data).encode(), headers={**(headers or {}), 'Content-Type': 'application/json'})
+
+class FakeGateway:
+    def __init__(self, host='127.0.0.1', port=0, recommended_shards=1):
+        self.host = host
+        self.port = port
+        self.recommended_shards = recommended_shards
+        self.identified = Counter()
+        self.shard_counts = set()
+        self.github_polls = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._runner = None
+        self._ready = threading.Event()
+
+    @property
+    def api_url(self):
+        return f"http://{self.host}:{self.port}/api/v10"
+
+    @property
+    def gateway_url(self):
+        return f"ws://{self.host}:{self.port}/gateway"
+
+    @property
+    def github_url(self):
+        return f"http://{self.host}:{self.port}/github"
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.identified), set(self.shard_counts), self.github_polls
+
+    async def _me(self, request):
+        return json_response(BOT_USER)
+
+    async def _application(self, request):
+        return json_response({
+            'id': APPLICATION_ID, 'name': 'video-manager', 'icon': None, 'description': '', 'summary': '',
+            'bot_public': False, 'bot_require_code_grant': False, 'owner': BOT_USER, 'verify_key': '', 'flags': 0,
+        })
+
+    async def _bot_gateway(self, request):
+        return json_response({
+            'url': self.gateway_url,
+            'shards': self.recommended_shards,
+            'session_start_limit': {'total': 1000, 'remaining': 1000, 'reset_after': 0, 'max_concurrency': 1},
+        })
+
+    async def _commands(self, request):
+        return json_response([])
+
+    async def _github_repos(self, request):
+        with self._lock:
+            self.github_polls += 1
+        return json_response([], headers={'ETag': '"repos"'})
+
+    async def _gateway(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_str(json.dumps({'op': 10, 'd': {'heartbeat_interval': 41250}, 's': None, 't': None}))
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            payload = json.loads(message.data)
+            if payload['op'] == 1:
+                await ws.send_str(json.dumps({'op': 11, 'd': None, 's': None, 't': None}))
+            elif payload['op'] == 2:
+                shard_id, shard_count = payload['d'].get('shard', [0, 1])
+                with self._lock:
+                    self.identified[shard_id] += 1
+                    self.shard_counts.add(shard_count)
+                await ws.send_str(json.dumps({'op': 0, 's': 1, 't': 'READY', 'd': {
+                    'v': 10,
+                    'user': BOT_USER,
+                    'guilds': [],
+                    'session_id': f"session-{shard_id}",
+                    'resume_gateway_url': self.gateway_url,
+                    'shard': [shard_id, shard_count],
+                    'application': {'id': APPLICATION_ID, 'flags': 0},
+                }}))
+        return ws
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get('/api/v10/users/@me', self._me)
+        app.router.add_get('/api/v10/oauth2/applications/@me', self._application)
+        app.router.add_get('/api/v10/gateway/bot', self._bot_gateway)
+        app.router.add_put('/api/v10/applications/{application_id}/commands', self._commands)
+        app.router.add_get('/github/users/{username}/repos', self._github_repos)
+        app.router.add_get('/gateway', self._gateway)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+
+    def start(self):
+        """Serve from a background thread. Returns once the server is listening."""
+        threading.Thread(target=self._serve, name='fake-gateway', daemon=True).start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
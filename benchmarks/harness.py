@@ -0,0 +1,269 @@
+"""Shared pieces of the load benchmarks: seeded databases, Discord stand-ins and latency statistics."""
+import asyncio
+import json
+import os
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+SIZES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+
+MAKERS = 1000
+EDITORS = 200
+STATUSES = ['submitted', 'queued', 'downloading', 'uploading', 'completed', 'failed']
+WORDS = (
+    "tutorial review gaming music travel cooking drone timelapse speedrun vlog unboxing python "
+    "minecraft guitar piano painting fitness yoga camping fishing coffee budget setup studio "
+    "interview podcast trailer highlights montage reaction challenge documentary history science "
+    "space ocean mountain city night winter summer beginner advanced tips tricks build repair"
+).split()
+
+# Snowflake-sized ids so the bot treats makers and editors as Discord users.
+def maker_id(n):
+    return str(100000000000000000 + n)
+
+def editor_id(n):
+    return str(200000000000000000 + n)
+
+def random_text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+def seed_database(videos, batch_size=10000):
+    """Return the path of a database seeded with `videos` videos, building it once and reusing it."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"videos-{videos}.db")
+    if os.path.exists(path):
+        return path
+
+    sys.path.insert(0, ROOT)
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from migrations import run_migrations
+
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}")
+    asyncio.run(run_migrations(engine))
+    asyncio.run(engine.dispose())
+
+    rng = random.Random(videos)
+    started = datetime(2023, 1, 1)
+    conn = sqlite3.connect(tmp_path)
+    with conn:
+        for offset in range(0, videos, batch_size):
+            rows = []
+            for n in range(offset, min(offset + batch_size, videos)):
+                created_at = started + timedelta(seconds=n * 63072000 // videos)
+                rows.append((
+                    random_text(rng, 4).title(), random_text(rng, 30), maker_id(rng.randrange(MAKERS)),
+                    editor_id(rng.randrange(EDITORS)), f"https://drive.google.com/file/d/{n}",
+                    rng.choice(STATUSES), created_at, created_at
+                ))
+            conn.executemany(
+                "INSERT INTO video (title, description, maker, editor, gdrive_link, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            print(f"Seeded {offset + len(rows)}/{videos} videos", file=sys.stderr)
+        conn.executemany(
+            "INSERT OR IGNORE INTO editor_ratings (editor_id, rater_id, rating) VALUES (?, ?, ?)",
+            [(editor_id(rng.randrange(EDITORS)), maker_id(rng.randrange(MAKERS)), rng.randint(1, 5))
+             for _ in range(min(videos, 20000))]
+        )
+        conn.execute(
+            "INSERT INTO maker_stats (maker, video_count) SELECT maker, count(id) FROM video GROUP BY maker"
+        )
+        conn.execute(
+            "INSERT INTO editor_rating_stats (editor_id, rating_sum, rating_count, avg_rating) "
+            "SELECT editor_id, sum(rating), count(rating), avg(rating) FROM editor_ratings GROUP BY editor_id"
+        )
+    conn.close()
+    os.replace(tmp_path, path)
+    return path
+
+def prepare_environment(videos):
+    """Point the bot and web modules at a scratch copy of the seeded database. Call before importing them."""
+    seeded = seed_database(videos)
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    database = os.path.join(workdir, 'videos.db')
+    with open(seeded, 'rb') as src, open(database, 'wb') as dst:
+        while chunk := src.read(1 << 20):
+            dst.write(chunk)
+    with open(os.path.join(workdir, 'config.json'), 'w') as f:
+        json.dump({key: '1' for key in (
+            'editor_channel_id', 'thumbnail_channel_id', 'github_issues_channel_id', 'support_channel_id',
+            'trusted_role_id', 'github_token', 'github_username', 'youtube_token_path'
+        )}, f)
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{database}",
+        'CONFIG_PATH': os.path.join(workdir, 'config.json'),
+        'CACHE_BACKEND': 'memory',
+        'METRICS_PORT': '',
+        'JOB_WORKERS': '0',
+    })
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+
+    # Seeded databases are kept between runs; bring the copy up to the current schema.
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from migrations import run_migrations
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database}")
+    asyncio.run(run_migrations(engine))
+    asyncio.run(engine.dispose())
+    return workdir
+
+# Stand-ins for the parts of discord.py the command callbacks touch. They
+# record what a command sent instead of talking to Discord.
+
+class FakePermissions:
+    def __init__(self, administrator=False):
+        self.administrator = administrator
+
+class FakeUser:
+    def __init__(self, user_id, administrator=False):
+        self.id = int(user_id)
+        self.name = f"user{user_id}"
+        self.display_name = self.name
+        self.mention = f"<@{user_id}>"
+        self.guild_permissions = FakePermissions(administrator)
+
+class FakeResponse:
+    def __init__(self):
+        self.sent = []
+        self.modal = None
+
+    def is_done(self):
+        return bool(self.sent) or self.modal is not None
+
+    async def send_message(self, content=None, **kwargs):
+        self.sent.append((content, kwargs))
+
+    async def edit_message(self, **kwargs):
+        self.sent.append((None, kwargs))
+
+    async def send_modal(self, modal):
+        self.modal = modal
+
+    async def defer(self, **kwargs):
+        pass
+
+class FakeInteraction:
+    def __init__(self, user):
+        self.user = user
+        self.response = FakeResponse()
+        self.extras = {}
+        self.command = None
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.messages = 0
+
+    async def send(self, *args, **kwargs):
+        self.messages += 1
+        return self
+
+def install_fake_client(bot):
+    """Resolve users and channels locally, as if the gateway cache were warm."""
+    channels = {}
+    bot.get_user = lambda user_id: FakeUser(user_id)
+    bot.get_channel = lambda channel_id: channels.setdefault(channel_id, FakeChannel(channel_id))
+
+    async def fetch_user(user_id):
+        return FakeUser(user_id)
+    bot.fetch_user = fetch_user
+
+# Measurement
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1 << 20)
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize(latencies, errors, elapsed, rss_before):
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'throughput': (len(latencies) + errors) / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+        'max_ms': max(latencies) * 1000 if latencies else None,
+        'rss_mb': rss_mb(),
+        'rss_growth_mb': rss_mb() - rss_before,
+    }
+
+async def run_async_load(call, total, concurrency):
+    """Run call(n) for n in range(total) with `concurrency` in flight and summarize the latencies."""
+    latencies, errors = [], 0
+    counter = iter(range(total))
+    rss_before = rss_mb()
+
+    async def worker():
+        nonlocal errors
+        for n in counter:
+            started = time.perf_counter()
+            try:
+                await call(n)
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    print(f"First error: {e!r}", file=sys.stderr)
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started, rss_before)
+
+def run_threaded_load(call, total, concurrency):
+    """Like run_async_load for blocking calls, one thread per concurrent client."""
+    from concurrent.futures import ThreadPoolExecutor
+    import threading
+
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    rss_before = rss_mb()
+
+    def timed(n):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            call(n)
+        except Exception as e:
+            with lock:
+                errors += 1
+                if errors == 1:
+                    print(f"First error: {e!r}", file=sys.stderr)
+            return
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(total)))
+    return summarize(latencies, errors, time.perf_counter() - started, rss_before)
+
+def compare(results, baseline, tolerance):
+    """Return a list of regressions: p99 latencies more than `tolerance` above the baseline."""
+    regressions = []
+    for size, scenarios in results.items():
+        for name, stats in scenarios.items():
+            before = baseline.get(size, {}).get(name)
+            if not before or before.get('p99_ms') is None or stats.get('p99_ms') is None:
+                continue
+            if stats['p99_ms'] > before['p99_ms'] * (1 + tolerance):
+                regressions.append(f"{size} {name}: p99 {before['p99_ms']:.1f} ms -> {stats['p99_ms']:.1f} ms")
+            if stats['errors'] > before.get('errors', 0):
+                regressions.append(f"{size} {name}: errors {before.get('errors', 0)} -> {stats['errors']}")
+    return regressions
@@ -1,24 +1,29 @@
 import discord
+from discord import app_commands
 from discord.ext import commands
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, func
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
 import aiohttp
 import asyncio
 import os
-from github import Github, GithubException
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+import time
 from concurrent.futures import ThreadPoolExecutor
-import requests
-import json
 from datetime import datetime
 from dotenv import load_dotenv
-import matplotlib.pyplot as plt
 import io
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_bcrypt import Bcrypt
+from user_cache import UserCache
+from config_store import config_store
+from dispatcher import MessageDispatcher
+from metrics import monitor_event_loop, observe_command, start_metrics_server, watch_queue, watch_thread_pool
+from charts import chart_pool, render_bar_chart
+from github_watcher import GitHubIssueWatcher
+from leases import LeaderLease
+from cluster import parse_shard_ids
+from jobs import JobWorkerPool, PipelineBusy, enqueue_pipeline, get_stage_timings
+from pipeline import download_stage, transcode_check_stage, thumbnail_stage
+from thumbnails import thumbnail_pool, youtube_thumbnail
+from database import (
+    check_schema, close_db, add_video, get_video, find_videos, get_recent_videos, get_top_makers, get_monthly_video_counts,
+    get_editor_rating, set_editor_rating, get_top_editors
+)
 
 load_dotenv()
 
@@ -32,59 +37,55 @@ TRUSTED_ROLE_ID = os.getenv('TRUSTED_ROLE_ID')
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
 YOUTUBE_TOKEN_PATH = os.getenv('YOUTUBE_TOKEN_PATH')
 
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = os.getenv('METRICS_PORT', '9108')
+
+# Sharding: SHARD_COUNT=auto (Discord's recommendation) or a number runs an
+# AutoShardedBot; SHARD_IDS (e.g. "0-3") limits this process to some of the
+# shards, as cluster.py does for each process it starts.
+SHARD_COUNT = os.getenv('SHARD_COUNT')
+SHARD_IDS = os.getenv('SHARD_IDS')
+
+# Only needed to run against a gateway proxy, or the fake gateway in benchmarks/.
+if os.getenv('DISCORD_API_URL'):
+    discord.http.Route.BASE = os.getenv('DISCORD_API_URL')
+if os.getenv('DISCORD_GATEWAY_URL'):
+    import yarl
+    discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(os.getenv('DISCORD_GATEWAY_URL'))
+
+def record_command(interaction, status):
+    started = interaction.extras.get('started')
+    if started is not None and interaction.command is not None:
+        observe_command(interaction.command.qualified_name, status, time.perf_counter() - started)
+
+class InstrumentedCommandTree(app_commands.CommandTree):
+    # interaction_check runs before every slash command; completion and errors
+    # are recorded by on_app_command_completion and on_error.
+    async def interaction_check(self, interaction):
+        interaction.extras['started'] = time.perf_counter()
+        return True
+
+    async def on_error(self, interaction, error):
+        record_command(interaction, 'error')
+        await super().on_error(interaction, error)
+
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents)
-
-# Database setup
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///videos.db')
-engine = create_engine(DATABASE_URL)
-Session = sessionmaker(bind=engine)
-session = Session()
-Base = declarative_base()
-
-class Video(Base):
-    __tablename__ = 'video'
-    id = Column(Integer, primary_key=True)
-    title = Column(String(100), nullable=False)
-    description = Column(Text, nullable=False)
-    maker = Column(String(100), nullable=False)
-    editor = Column(String(100))
-    thumbnail_maker = Column(String(100))
-    edited_path = Column(String(200))
-    thumbnail_path = Column(String(200))
-    gdrive_link = Column(String(200), nullable=False)
-    status = Column(String(50), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-class EditorRating(Base):
-    __tablename__ = 'editor_ratings'
-    editor_id = Column(String(100), primary_key=True)
-    rater_id = Column(String(100), primary_key=True)
-    rating = Column(Integer, nullable=False)
-
-Base.metadata.create_all(engine)
-
-# Configuration
-config = {}
+if SHARD_COUNT:
+    bot = commands.AutoShardedBot(
+        command_prefix='!', intents=intents, tree_cls=InstrumentedCommandTree,
+        shard_count=None if SHARD_COUNT == 'auto' else int(SHARD_COUNT),
+        shard_ids=parse_shard_ids(SHARD_IDS) if SHARD_IDS else None
+    )
+else:
+    bot = commands.Bot(command_prefix='!', intents=intents, tree_cls=InstrumentedCommandTree)
+user_cache = UserCache(bot)
+dispatcher = MessageDispatcher(bot)
+watch_queue('discord_outbound', dispatcher.queue_depth)
 
 # Thread pool for background tasks
 thread_pool = ThreadPoolExecutor(max_workers=5)
-
-# Load configuration
-def load_config():
-    if os.path.exists('config.json'):
-        with open('config.json', 'r') as f:
-            return json.load(f)
-    return {}
-
-# Save configuration
-def save_config(config):
-    with open('config.json', 'w') as f:
-        json.dump(config, f, indent=4)
-
-# Initialize config
-config = load_config()
+watch_thread_pool('bot', thread_pool)
 
 # Define allowed configuration keys
 ALLOWED_CONFIG_KEYS = [
@@ -98,20 +99,41 @@ ALLOWED_CONFIG_KEYS = [
 ]
 
 # Update configuration
-def update_config(key, value):
+async def update_config(key, value):
     if key in ALLOWED_CONFIG_KEYS:
-        config[key] = value
-        save_config(config)
+        await config_store.update_async({key: value})
         return True
     return False
 
+@bot.event
+async def setup_hook():
+    await check_schema()
+    job_workers.start()
+    bot.loop.create_task(monitor_event_loop('bot'))
+    if METRICS_PORT:
+        await start_metrics_server(METRICS_HOST, int(METRICS_PORT))
+
+@bot.event
+async def on_app_command_completion(interaction, command):
+    record_command(interaction, 'ok')
+
+# Every bot process competes for this; only the holder polls GitHub.
+github_lease = LeaderLease('github_issues')
+github_task = None
+
 @bot.event
 async def on_ready():
-    print(f'{bot.user} has connected to Discord!')
-    await bot.tree.sync()
-    config = load_config()
-    if all(config.values()):
-        bot.loop.create_task(monitor_github_issues())
+    global github_task
+    shard_ids = getattr(bot, 'shard_ids', None)
+    print(f'{bot.user} has connected to Discord!' + (f" (shards {shard_ids} of {bot.shard_count})" if shard_ids else ''))
+    # Commands are global, so one process syncing them is enough.
+    if not shard_ids or 0 in shard_ids:
+        await bot.tree.sync()
+    config_store.start_watching()
+    if all(config_store.values()):
+        # on_ready fires again after a reconnect; keep a single poller.
+        if github_task is None or github_task.done():
+            github_task = bot.loop.create_task(github_lease.run(monitor_github_issues))
     else:
         print("Please configure all settings using /config command")
 
@@ -125,6 +147,8 @@ async def help(interaction: discord.Interaction):
             ("/submit_video", "Submit a new video for editing"),
             ("/video_status", "Check the status of your submitted videos"),
             ("/video_analytics", "View video submission analytics"),
+            ("/search_videos", "Search video titles and descriptions"),
+            ("/publish_video", "Run a video through download, checks and YouTube upload (Admin only)"),
         ]),
         ("📊 Leaderboards & Ratings", [
             ("/leaderboard", "Show the top 10 content creators"),
@@ -147,9 +171,7 @@ async def help(interaction: discord.Interaction):
 @commands.has_permissions(administrator=True)
 async def config(interaction: discord.Interaction, setting: str, value: str):
     if interaction.user.guild_permissions.administrator:
-        if setting in ALLOWED_CONFIG_KEYS:
-            config[setting] = value
-            save_config(config)
+        if await update_config(setting, value):
             embed = discord.Embed(title="Configuration Updated", color=discord.Color.green())
             embed.add_field(name="Setting", value=setting, inline=True)
             embed.add_field(name="New Value", value=value if setting not in ['github_token', 'youtube_token_path'] else '[REDACTED]', inline=True)
@@ -166,7 +188,7 @@ async def config(interaction: discord.Interaction, setting: str, value: str):
 async def show_config(interaction: discord.Interaction):
     if interaction.user.guild_permissions.administrator:
         embed = discord.Embed(title="Current Configuration", color=discord.Color.blue())
-        for key, value in config.items():
+        for key, value in config_store.items():
             if key in ['github_token', 'youtube_token_path']:
                 value = '[REDACTED]' if value else 'Not set'
             embed.add_field(name=key.replace('_', ' ').title(), value=value, inline=False)
@@ -176,35 +198,32 @@ async def show_config(interaction: discord.Interaction):
 
 @bot.tree.command()
 async def submit_video(interaction: discord.Interaction):
-    if not all(config.values()):
+    if not all(config_store.values()):
         embed = discord.Embed(title="Bot Not Configured", color=discord.Color.red())
         embed.description = "Bot is not fully configured. Please ask an admin to set all configuration values."
         await interaction.response.send_message(embed=embed)
         return
 
     class VideoSubmission(discord.ui.Modal, title='Submit a New Video'):
-        title = discord.ui.TextInput(label='Video Title', placeholder='Enter the title of your video')
+        video_title = discord.ui.TextInput(label='Video Title', placeholder='Enter the title of your video')
         description = discord.ui.TextInput(label='Video Description', style=discord.TextStyle.paragraph, placeholder='Describe your video')
         gdrive_link = discord.ui.TextInput(label='Google Drive Link', placeholder='Paste the Google Drive link to your video')
 
         async def on_submit(self, interaction: discord.Interaction):
-            new_video = Video(
-                title=self.title.value,
+            await add_video(
+                title=self.video_title.value,
                 description=self.description.value,
                 maker=str(interaction.user.id),
                 gdrive_link=self.gdrive_link.value,
                 status='submitted'
             )
-            session.add(new_video)
-            session.commit()
 
-            editor_channel = bot.get_channel(int(config['editor_channel_id']))
             embed = discord.Embed(title="New Video Submitted", color=discord.Color.green())
-            embed.add_field(name="Title", value=self.title.value, inline=False)
+            embed.add_field(name="Title", value=self.video_title.value, inline=False)
             embed.add_field(name="Description", value=self.description.value, inline=False)
             embed.add_field(name="Drive Link", value=self.gdrive_link.value, inline=False)
             embed.set_footer(text=f"Submitted by {interaction.user.name}")
-            await editor_channel.send(embed=embed)
+            dispatcher.send_embed(config_store['editor_channel_id'], embed)
 
             success_embed = discord.Embed(title="Video Submitted Successfully", color=discord.Color.green())
             success_embed.description = "Your video has been submitted for editing."
@@ -215,7 +234,7 @@ async def submit_video(interaction: discord.Interaction):
 
 @bot.tree.command()
 async def video_status(interaction: discord.Interaction):
-    videos = session.query(Video).filter_by(maker=str(interaction.user.id)).order_by(Video.created_at.desc()).limit(5).all()
+    videos = await get_recent_videos(str(interaction.user.id))
 
     if not videos:
         await interaction.response.send_message("You haven't submitted any videos yet.")
@@ -229,22 +248,19 @@ async def video_status(interaction: discord.Interaction):
 
 @bot.tree.command()
 async def leaderboard(interaction: discord.Interaction):
-    results = session.query(Video.maker, func.count(Video.id).label('video_count')) \
-        .group_by(Video.maker) \
-        .order_by(func.count(Video.id).desc()) \
-        .limit(10) \
-        .all()
+    results = await get_top_makers(10)
+
+    names = await user_cache.names(maker_id for maker_id, _ in results)
 
     embed = discord.Embed(title="Top 10 Content Creators", color=discord.Color.gold())
     for i, (maker_id, count) in enumerate(results, 1):
-        user = await bot.fetch_user(int(maker_id))
-        embed.add_field(name=f"{i}. {user.name}", value=f"{count} videos", inline=False)
+        embed.add_field(name=f"{i}. {names[maker_id]}", value=f"{count} videos", inline=False)
 
     await interaction.response.send_message(embed=embed)
 
 @bot.tree.command()
 async def rate_editor(interaction: discord.Interaction, editor: discord.Member):
-    current_rating = session.query(EditorRating).filter_by(editor_id=str(editor.id), rater_id=str(interaction.user.id)).first()
+    current_rating = await get_editor_rating(str(editor.id), str(interaction.user.id))
 
     embed = discord.Embed(title=f"Rate Editor: {editor.name}", color=discord.Color.blue())
     embed.description = f"Current rating: {'Not rated' if current_rating is None else f'{current_rating.rating} ⭐'}"
@@ -256,13 +272,7 @@ async def rate_editor(interaction: discord.Interaction, editor: discord.Member):
 
         async def callback(self, interaction: discord.Interaction):
             rating = int(self.values[0])
-            editor_rating = session.query(EditorRating).filter_by(editor_id=str(editor.id), rater_id=str(interaction.user.id)).first()
-            if editor_rating:
-                editor_rating.rating = rating
-            else:
-                editor_rating = EditorRating(editor_id=str(editor.id), rater_id=str(interaction.user.id), rating=rating)
-                session.add(editor_rating)
-            session.commit()
+            await set_editor_rating(str(editor.id), str(interaction.user.id), rating)
 
             embed = discord.Embed(title="Rating Submitted", color=discord.Color.green())
             embed.description = f"You've rated {editor.name} with {rating} ⭐"
@@ -274,44 +284,32 @@ async def rate_editor(interaction: discord.Interaction, editor: discord.Member):
 
 @bot.tree.command()
 async def video_analytics(interaction: discord.Interaction):
-    results = session.query(func.strftime('%Y-%m', Video.created_at).label('month'), func.count(Video.id).label('count')) \
-        .group_by('month') \
-        .order_by('month') \
-        .all()
+    results = await get_monthly_video_counts()
+    if not results:
+        await interaction.response.send_message("No videos have been submitted yet.")
+        return
 
     months, counts = zip(*results)
-    plt.figure(figsize=(10, 5))
-    plt.bar(months, counts)
-    plt.title("Video Submissions Over Time")
-    plt.xlabel("Month")
-    plt.ylabel("Number of Videos")
-    plt.xticks(rotation=45)
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    
-    file = discord.File(buf, filename="video_analytics.png")
+    png = await render_bar_chart(months, counts, "Video Submissions Over Time", "Month", "Number of Videos")
+
+    file = discord.File(io.BytesIO(png), filename="video_analytics.png")
     await interaction.response.send_message(file=file)
 
 @bot.tree.command()
 async def editor_leaderboard(interaction: discord.Interaction):
-    results = session.query(EditorRating.editor_id, func.avg(EditorRating.rating).label('avg_rating'), func.count(EditorRating.rating).label('total_ratings')) \
-        .group_by(EditorRating.editor_id) \
-        .order_by(func.avg(EditorRating.rating).desc(), func.count(EditorRating.rating).desc()) \
-        .limit(10) \
-        .all()
+    results = await get_top_editors(10)
+
+    names = await user_cache.names(editor_id for editor_id, _, _ in results)
 
     embed = discord.Embed(title="Top 10 Editors", color=discord.Color.gold())
     for i, (editor_id, avg_rating, total_ratings) in enumerate(results, 1):
-        user = await bot.fetch_user(int(editor_id))
-        embed.add_field(name=f"{i}. {user.name}", value=f"Rating: {avg_rating:.2f} ⭐ ({total_ratings} ratings)", inline=False)
+        embed.add_field(name=f"{i}. {names[editor_id]}", value=f"Rating: {avg_rating:.2f} ⭐ ({total_ratings} ratings)", inline=False)
 
     await interaction.response.send_message(embed=embed)
 
 @bot.tree.command()
 async def video_info(interaction: discord.Interaction, video_id: int):
-    video = session.query(Video).get(video_id)
+    video = await get_video(video_id)
 
     if not video:
         await interaction.response.send_message(f"No video found with ID {video_id}", ephemeral=True)
@@ -330,30 +328,69 @@ async def video_info(interaction: discord.Interaction, video_id: int):
     embed.add_field(name="Google Drive Link", value=video.gdrive_link, inline=False)
     embed.add_field(name="Submitted at", value=video.created_at.strftime("%Y-%m-%d %H:%M:%S"), inline=True)
 
+    stages = await get_stage_timings(video_id)
+    if stages:
+        embed.add_field(name="Pipeline", value="\n".join(
+            f"{stage.stage}: {stage.status}" + (f" ({stage.duration:.1f}s)" if stage.duration is not None else "")
+            for stage in stages
+        ), inline=False)
+
+    await interaction.response.send_message(embed=embed)
+
+SEARCH_RESULTS_PER_PAGE = 10
+
+@bot.tree.command()
+async def search_videos(interaction: discord.Interaction, query: str, page: int = 1):
+    page = max(page, 1)
+    videos, has_more = await find_videos(query, SEARCH_RESULTS_PER_PAGE, (page - 1) * SEARCH_RESULTS_PER_PAGE)
+
+    if not videos:
+        await interaction.response.send_message(f"No videos match \"{query}\".", ephemeral=True)
+        return
+
+    embed = discord.Embed(title=f"Search Results: {query}", color=discord.Color.blue())
+    for video in videos:
+        description = video.description if len(video.description) <= 100 else video.description[:97] + "..."
+        embed.add_field(name=f"#{video.id} {video.title}", value=f"Status: {video.status.capitalize()}\n{description}", inline=False)
+    footer = f"Page {page}"
+    if has_more:
+        footer += f" · Use page:{page + 1} for more results"
+    embed.set_footer(text=footer)
+
+    await interaction.response.send_message(embed=embed)
+
+@bot.tree.command()
+@commands.has_permissions(administrator=True)
+async def publish_video(interaction: discord.Interaction, video_id: int, priority: int = 0):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+        return
+
+    if not await get_video(video_id):
+        await interaction.response.send_message(f"No video found with ID {video_id}", ephemeral=True)
+        return
+
+    try:
+        await enqueue_pipeline(video_id, priority=priority)
+    except PipelineBusy:
+        await interaction.response.send_message(f"Video {video_id} is already being processed.", ephemeral=True)
+        return
+
+    embed = discord.Embed(title="Video Queued for Publishing", color=discord.Color.green())
+    embed.description = f"Video {video_id} will be downloaded, checked and uploaded to YouTube. Use /video_info to follow its progress."
     await interaction.response.send_message(embed=embed)
 
 async def monitor_github_issues():
-    github_client = Github(config['github_token'])
-    user = github_client.get_user(config['github_username'])
-    
-    while True:
-        for repo in user.get_repos():
-            try:
-                for issue in repo.get_issues(state='open'):
-                    channel = bot.get_channel(int(config['github_issues_channel_id']))
-                    embed = discord.Embed(title=f"New Issue in {repo.name}", color=discord.Color.orange())
-                    embed.add_field(name="Title", value=issue.title, inline=False)
-                    embed.add_field(name="Link", value=issue.html_url, inline=False)
-                    embed.set_footer(text=f"Created at {issue.created_at}")
-                    await channel.send(embed=embed)
-            except GithubException as e:
-                if e.status == 403 and "Repository access blocked" in str(e):
-                    print("Error: Repository access is blocked. Please check your GitHub account status.")
-                    # You might want to disable this feature or retry after some time
-                else:
-                    print(f"An unexpected error occurred: {e}")
-        
-        await asyncio.sleep(300)  # Check every 5 minutes
+    watcher = GitHubIssueWatcher(config_store['github_token'], config_store['github_username'])
+
+    async def post_issue(repo_name, issue):
+        embed = discord.Embed(title=f"New Issue in {repo_name.split('/')[-1]}", color=discord.Color.orange())
+        embed.add_field(name="Title", value=issue['title'], inline=False)
+        embed.add_field(name="Link", value=issue['html_url'], inline=False)
+        embed.set_footer(text=f"Created at {issue['created_at']}")
+        dispatcher.send_embed(config_store['github_issues_channel_id'], embed)
+
+    await watcher.run(post_issue, interval=300)  # Check every 5 minutes
 
 @bot.event
 async def on_message(message):
@@ -362,9 +399,7 @@ async def on_message(message):
             parts = message.content.split(maxsplit=2)
             if len(parts) == 3:
                 setting, value = parts[1], parts[2]
-                if setting in ALLOWED_CONFIG_KEYS:
-                    config[setting] = value
-                    save_config(config)
+                if await update_config(setting, value):
                     await message.channel.send(f"Configuration updated: {setting} = {value if setting not in ['github_token', 'youtube_token_path'] else '[REDACTED]'}")
                 else:
                     await message.channel.send(f"Invalid setting: {setting}")
@@ -372,30 +407,23 @@ async def on_message(message):
                 await message.channel.send("Usage: !config <setting> <value>")
         elif message.content == '!show_config':
             config_str = "\n".join([f"{k}: {'[REDACTED]' if k in ['github_token', 'youtube_token_path'] else v}" 
-                                    for k, v in config.items()])
+                                    for k, v in config_store.items()])
             await message.channel.send(f"Current configuration:\n```\n{config_str}\n```")
     await bot.process_commands(message)
 
-def download_file(url, filename):
-    with requests.get(url, stream=True) as r:
-        r.raise_for_status()
-        with open(filename, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
-
 async def upload_to_youtube(video_id):
     # Retrieve video info from database
-    video_data = session.query(Video).get(video_id)
+    video_data = await get_video(video_id)
 
-    # Set up YouTube API client
-    credentials = Credentials.from_authorized_user_file(config['youtube_token_path'], ['https://www.googleapis.com/auth/youtube.upload'])
-    youtube = build('youtube', 'v3', credentials=credentials)
+    credit_ids = [video_data.maker, video_data.editor, video_data.thumbnail_maker]
+    names = await user_cache.names(user_id for user_id in credit_ids if user_id)
+    maker_name, editor_name, thumbnail_name = (names.get(user_id, 'Unknown user') for user_id in credit_ids)
 
     # Prepare video upload
     request_body = {
         'snippet': {
             'title': video_data.title,
-            'description': video_data.description + f"\n\nCredits:\nMaker: {bot.get_user(int(video_data.maker)).name}\nEditor: {bot.get_user(int(video_data.editor)).name}\nThumbnail: {bot.get_user(int(video_data.thumbnail_maker)).name}",
+            'description': video_data.description + f"\n\nCredits:\nMaker: {maker_name}\nEditor: {editor_name}\nThumbnail: {thumbnail_name}",
             'tags': ['YourChannelTag']
         },
         'status': {
@@ -403,26 +431,44 @@ async def upload_to_youtube(video_id):
         }
     }
 
-    # Upload video
-    media_file = MediaFileUpload(video_data.edited_path)
-    response_upload = youtube.videos().insert(
-        part='snippet,status',
-        body=request_body,
-        media_body=media_file
-    ).execute()
-
-    # Set thumbnail
-    youtube.thumbnails().set(
-        videoId=response_upload.get('id'),
-        media_body=MediaFileUpload(video_data.thumbnail_path)
-    ).execute()
-
-    print(f"Video uploaded successfully! Video ID: {response_upload.get('id')}")
+    # The checked 1280x720 rendition rather than the file as submitted; rebuilt
+    # in the thumbnail worker pool if it was evicted from the cache.
+    thumbnail_path = await youtube_thumbnail(video_data.thumbnail_path) if video_data.thumbnail_path else None
+
+    def report_progress(stats):
+        print(f"Uploading video {video_id}: {stats.progress:.0%} ({stats.throughput / 1e6:.2f} MB/s)")
+
+    # Resumable chunked upload in the worker pool; an interrupted upload continues
+    # from the last acknowledged chunk the next time this runs.
+    def upload():
+        # googleapiclient is slow to import, so it is only loaded once something is uploaded.
+        from youtube_upload import build_youtube_client, upload_video
+        youtube = build_youtube_client(config_store['youtube_token_path'])
+        return upload_video(youtube, video_id, video_data.edited_path, request_body,
+                            thumbnail_path=thumbnail_path, on_progress=report_progress)
+
+    youtube_id, stats = await asyncio.get_running_loop().run_in_executor(thread_pool, upload)
+    print(f"Video uploaded successfully! Video ID: {youtube_id} {stats.as_dict()}")
+    return youtube_id
+
+async def upload_stage(video):
+    if video.youtube_id:
+        print(f"Video {video.id} is already on YouTube as {video.youtube_id}; not uploading it again")
+        from youtube_upload import UploadSessionStore
+        UploadSessionStore().remove(video.id)
+        return None
+    return {'youtube_id': await upload_to_youtube(video.id)}
+
+job_workers = JobWorkerPool({
+    'download': download_stage,
+    'transcode_check': transcode_check_stage,
+    'thumbnail': thumbnail_stage,
+    'upload': upload_stage,
+}, concurrency=int(os.getenv('JOB_WORKERS', 4)))
 
 @bot.command()
 async def support(ctx, *, title):
-    config = load_config()
-    support_channel_id = config.get('support_channel_id')
+    support_channel_id = config_store.get('support_channel_id')
     
     if not support_channel_id:
         await ctx.send("Support channel not configured. Please ask an admin to set it up.")
@@ -441,16 +487,37 @@ async def support(ctx, *, title):
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def support_channel(ctx, channel: discord.TextChannel):
-    config = load_config()
-    config['support_channel_id'] = str(channel.id)
-    save_config(config)
+    await config_store.update_async({'support_channel_id': str(channel.id)})
     await ctx.send(f"Support channel set to {channel.mention}")
 
+async def shutdown():
+    # Stop everything that uses the database before closing its pool.
+    if github_task is not None:
+        github_task.cancel()
+        await asyncio.gather(github_task, return_exceptions=True)
+    await job_workers.stop()
+    thumbnail_pool.shutdown()
+    chart_pool.shutdown()
+    await dispatcher.close()
+    await close_db()
+
 def run_discord_bot():
     if not DISCORD_TOKEN:
         print("Discord token not found. Please set the DISCORD_TOKEN environment variable.")
         return
-    bot.run(DISCORD_TOKEN)
+
+    async def runner():
+        try:
+            async with bot:
+                await bot.start(DISCORD_TOKEN)
+        finally:
+            await shutdown()
+
+    discord.utils.setup_logging()
+    try:
+        asyncio.run(runner())
+    except KeyboardInterrupt:
+        pass
 
 if __name__ == '__main__':
     run_discord_bot()
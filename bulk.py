@@ -0,0 +1,250 @@
+import csv
+import io
+import json
+import sys
+import time
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.future import select
+from database import DATABASE_URL, sync_database_url
+from models import Comment, EditorRating, Video
+from migrations import VIDEO_FTS_INSERT_TRIGGER
+from db_profiles import make_sync_engine
+
+# Bulk import and export for manage.py. Rows go through a blocking engine in
+# large batches: executemany on SQLite, COPY on Postgres, one transaction per
+# batch. Exports stream from a server-side cursor, so memory use stays flat.
+
+# (name, type, required, max length)
+VIDEO_FIELDS = [
+    ('id', int, False, None),
+    ('title', str, True, 100),
+    ('description', str, True, None),
+    ('maker', str, True, 100),
+    ('editor', str, False, 100),
+    ('thumbnail_maker', str, False, 100),
+    ('edited_path', str, False, 200),
+    ('thumbnail_path', str, False, 200),
+    ('thumbnail_digest', str, False, 64),
+    ('youtube_id', str, False, 20),
+    ('gdrive_link', str, True, 200),
+    ('status', str, False, 50),
+    ('created_at', datetime, False, None),
+    ('updated_at', datetime, False, None),
+]
+RATING_FIELDS = [
+    ('editor_id', str, True, 100),
+    ('rater_id', str, True, 100),
+    ('rating', int, True, None),
+]
+
+TABLES = {
+    'videos': Video.__table__,
+    'ratings': EditorRating.__table__,
+    'comments': Comment.__table__,
+}
+IMPORT_FIELDS = {'videos': VIDEO_FIELDS, 'ratings': RATING_FIELDS}
+
+class RowError(ValueError):
+    pass
+
+def _convert(name, kind, value, max_length):
+    if kind is int:
+        if isinstance(value, bool):
+            raise RowError(f"{name} must be an integer")
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise RowError(f"{name} must be an integer, got {value!r}")
+    if kind is datetime:
+        try:
+            return datetime.fromisoformat(str(value))
+        except ValueError:
+            raise RowError(f"{name} must be an ISO 8601 date/time, got {value!r}")
+    value = str(value)
+    if max_length and len(value) > max_length:
+        raise RowError(f"{name} is longer than {max_length} characters")
+    return value
+
+def validate_row(row, fields):
+    """Return a cleaned copy of row, raising RowError if it does not fit the table."""
+    clean = {}
+    for name, kind, required, max_length in fields:
+        value = row.get(name)
+        if value == '' or (required and isinstance(value, str) and not value.strip()):
+            value = None
+        if value is None:
+            if required:
+                raise RowError(f"{name} is required")
+            continue
+        clean[name] = _convert(name, kind, value, max_length)
+    unknown = set(row) - {field[0] for field in fields}
+    if unknown:
+        raise RowError(f"unknown column(s): {', '.join(sorted(unknown))}")
+    return clean
+
+def _video_defaults(row, now):
+    row.setdefault('status', 'submitted')
+    row.setdefault('created_at', now)
+    row.setdefault('updated_at', row['created_at'])
+    return row
+
+def _rating_checks(row, now):
+    if not 1 <= row['rating'] <= 5:
+        raise RowError("rating must be between 1 and 5")
+    return row
+
+FINALIZE = {'videos': _video_defaults, 'ratings': _rating_checks}
+
+def detect_format(path, file_format):
+    if file_format:
+        return file_format
+    return 'csv' if path.endswith('.csv') else 'ndjson'
+
+def read_rows(f, file_format):
+    """Yield (line number, dict) for each record in a CSV or NDJSON file."""
+    if file_format == 'csv':
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, RowError(f"invalid JSON: {e}")
+            continue
+        if not isinstance(row, dict):
+            yield line_number, RowError("each line must be a JSON object")
+            continue
+        yield line_number, row
+
+class Progress:
+    def __init__(self, verb):
+        self.verb = verb
+        self.started = time.monotonic()
+        self.count = 0
+
+    def add(self, count):
+        self.count += count
+        elapsed = time.monotonic() - self.started
+        print(f"{self.verb} {self.count} rows ({self.count / elapsed if elapsed else 0:.0f} rows/s)", file=sys.stderr)
+
+def _copy_rows(conn, table, rows):
+    columns = list(rows[0])
+    buf = io.StringIO()
+    # QUOTE_NONNUMERIC writes '' as "" (an empty string) and None unquoted (NULL).
+    writer = csv.writer(buf, quoting=csv.QUOTE_NONNUMERIC)
+    for row in rows:
+        writer.writerow([row.get(column) for column in columns])
+    buf.seek(0)
+    cursor = conn.connection.cursor()
+    cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+def _insert_statement(dialect_name, table):
+    insert = postgresql.insert if dialect_name == 'postgresql' else sqlite.insert
+    statement = insert(table)
+    if table is EditorRating.__table__:
+        # Re-importing a rating replaces it, as rating again from Discord does.
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.editor_id, table.c.rater_id],
+            set_={'rating': statement.excluded.rating}
+        )
+    return statement
+
+def _insert_videos_sqlite(conn, table, rows):
+    # Updating the FTS index row by row from its trigger costs several times
+    # more than the insert itself, so the batch is indexed in one statement.
+    # This runs inside the batch's transaction: no other writer ever sees the
+    # trigger missing.
+    max_id = conn.execute(select(func.max(table.c.id))).scalar() or 0
+    conn.exec_driver_sql("DROP TRIGGER IF EXISTS video_fts_insert")
+    conn.execute(_insert_statement('sqlite', table), rows)
+    conn.exec_driver_sql(
+        "INSERT INTO video_fts(rowid, title, description) SELECT id, title, description FROM video WHERE id > ?",
+        (max_id,)
+    )
+    conn.exec_driver_sql(VIDEO_FTS_INSERT_TRIGGER)
+
+def _write_batch(engine, table, rows):
+    # Rows with and without explicit ids take different column lists.
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row), []).append(row)
+    dialect_name = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect_name == 'sqlite':
+            # pysqlite would only open the transaction at the first INSERT, after the DDL below.
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        for columns, group in groups.items():
+            if dialect_name == 'postgresql' and table is Video.__table__:
+                _copy_rows(conn, table, group)
+            elif dialect_name == 'sqlite' and table is Video.__table__ and 'id' not in columns:
+                _insert_videos_sqlite(conn, table, group)
+            else:
+                conn.execute(_insert_statement(dialect_name, table), group)
+    if engine.dialect.name == 'postgresql' and table is Video.__table__ and any('id' in row for row in rows):
+        with engine.begin() as conn:
+            conn.exec_driver_sql("SELECT setval('video_id_seq', (SELECT max(id) FROM video))")
+
+def import_rows(kind, f, file_format, batch_size=10000, strict=False, max_errors=20):
+    """Validate and insert every row of f into the table for kind. Returns (imported, rejected)."""
+    table, fields, finalize = TABLES[kind], IMPORT_FIELDS[kind], FINALIZE[kind]
+    engine = make_sync_engine(sync_database_url(DATABASE_URL))
+    progress = Progress('Imported')
+    now = datetime.utcnow()
+    batch, rejected = [], 0
+    try:
+        for line_number, row in read_rows(f, file_format):
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                batch.append(finalize(validate_row(row, fields), now))
+            except RowError as e:
+                rejected += 1
+                if rejected <= max_errors:
+                    print(f"Line {line_number}: {e}", file=sys.stderr)
+                if strict:
+                    raise
+                continue
+            if len(batch) >= batch_size:
+                _write_batch(engine, table, batch)
+                progress.add(len(batch))
+                batch = []
+        if batch:
+            _write_batch(engine, table, batch)
+            progress.add(len(batch))
+    finally:
+        engine.dispose()
+    return progress.count, rejected
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def export_rows(kind, f, file_format, batch_size=10000):
+    """Stream every row of the table for kind to f. Returns the number of rows written."""
+    table = TABLES[kind]
+    columns = [column.name for column in table.columns]
+    engine = make_sync_engine(sync_database_url(DATABASE_URL))
+    progress = Progress('Exported')
+    writer = None
+    if file_format == 'csv':
+        writer = csv.writer(f)
+        writer.writerow(columns)
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=batch_size) \
+                .execute(select(table).order_by(*table.primary_key.columns))
+            for rows in result.partitions(batch_size):
+                for row in rows:
+                    if writer:
+                        writer.writerow([_json_value(value) for value in row])
+                    else:
+                        f.write(json.dumps(dict(zip(columns, map(_json_value, row)))) + '\n')
+                progress.add(len(rows))
+    finally:
+        engine.dispose()
+    return progress.count
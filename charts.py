@@ -0,0 +1,54 @@
+import asyncio
+import hashlib
+import io
+import json
+from collections import OrderedDict
+from pools import LazyProcessPool
+
+# Charts are rendered in worker processes so matplotlib never runs on the bot's
+# event loop, and the PNG bytes are cached by a hash of the data they plot.
+CHART_WORKERS = 2
+CACHE_SIZE = 64
+
+chart_pool = LazyProcessPool(CHART_WORKERS)
+_png_cache = OrderedDict()
+
+def draw_bar_chart(labels, values, title, xlabel, ylabel):
+    # Runs in a worker process. Uses the object-oriented API on the Agg canvas,
+    # so no pyplot global state is touched and nothing outlives the call.
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.bar(labels, values)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    fig.clear()
+    return buf.getvalue()
+
+async def render_bar_chart(labels, values, title, xlabel, ylabel):
+    """Return PNG bytes for a bar chart, serving repeated identical charts from cache."""
+    payload = json.dumps([list(labels), list(values), title, xlabel, ylabel], default=str)
+    key = hashlib.sha256(payload.encode()).hexdigest()
+    if key in _png_cache:
+        _png_cache.move_to_end(key)
+        return _png_cache[key]
+
+    loop = asyncio.get_running_loop()
+    png = await loop.run_in_executor(
+        chart_pool.get(), draw_bar_chart, list(labels), list(values), title, xlabel, ylabel
+    )
+    _png_cache[key] = png
+    while len(_png_cache) > CACHE_SIZE:
+        _png_cache.popitem(last=False)
+    return png
@@ -0,0 +1,177 @@
+"""Run the bot as several processes, each holding a contiguous range of gateway shards.
+
+    python cluster.py --processes 4 [--shards 16]
+
+Without --shards the shard count recommended by Discord is used. The
+coordinator applies migrations once, starts the processes with SHARD_COUNT and
+SHARD_IDS set, staggers their start so no two shards identify within the same
+rate-limit window, restarts any process that exits unexpectedly, and shuts
+them all down on Ctrl-C or SIGTERM.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.py')
+DISCORD_API_URL = os.getenv('DISCORD_API_URL', 'https://discord.com/api/v10')
+# Discord allows one IDENTIFY per max_concurrency shards every five seconds.
+IDENTIFY_INTERVAL = 5.0
+RESTART_BACKOFF_MAX = 60
+
+def parse_shard_ids(value):
+    """Parse "0-3,8,10-11" into [0, 1, 2, 3, 8, 10, 11]."""
+    shard_ids = []
+    for part in value.split(','):
+        part = part.strip()
+        if '-' in part:
+            first, last = part.split('-', 1)
+            shard_ids.extend(range(int(first), int(last) + 1))
+        elif part:
+            shard_ids.append(int(part))
+    return shard_ids
+
+def format_shard_ids(shard_ids):
+    return ','.join(str(shard_id) for shard_id in shard_ids)
+
+def split_shards(shard_count, processes):
+    """Split range(shard_count) into `processes` contiguous, nearly equal ranges."""
+    size, extra = divmod(shard_count, processes)
+    ranges, start = [], 0
+    for n in range(processes):
+        end = start + size + (1 if n < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return [shard_ids for shard_ids in ranges if shard_ids]
+
+def recommended_gateway(token):
+    """Return (shard count, max_concurrency) from Discord's GET /gateway/bot."""
+    request = urllib.request.Request(f"{DISCORD_API_URL}/gateway/bot", headers={
+        'Authorization': f"Bot {token}",
+        'User-Agent': 'DiscordBot (video-manager cluster)',
+    })
+    with urllib.request.urlopen(request, timeout=30) as response:
+        data = json.load(response)
+    return data['shards'], data.get('session_start_limit', {}).get('max_concurrency', 1)
+
+class Worker:
+    def __init__(self, index, shard_ids, shard_count, env):
+        self.index = index
+        self.shard_ids = shard_ids
+        self.env = {**env, 'SHARD_COUNT': str(shard_count), 'SHARD_IDS': format_shard_ids(shard_ids)}
+        self.process = None
+        self.started_at = None
+        self.restarts = 0
+        self.restart_at = None
+
+    def start(self):
+        # In its own session, so a Ctrl-C meant for the coordinator does not reach it twice.
+        self.process = subprocess.Popen([sys.executable, BOT_PATH], env=self.env, start_new_session=True)
+        self.started_at = time.monotonic()
+        self.restart_at = None
+        print(f"Started bot process {self.index} (pid {self.process.pid}) for shards {format_shard_ids(self.shard_ids)}")
+
+class Cluster:
+    def __init__(self, shard_count, processes, identify_interval=IDENTIFY_INTERVAL, max_concurrency=1,
+                 metrics_port=None):
+        self.shard_count = shard_count
+        self.identify_interval = identify_interval / max_concurrency
+        self.workers = []
+        for index, shard_ids in enumerate(split_shards(shard_count, processes)):
+            env = dict(os.environ)
+            # Each process serves its own metrics, on consecutive ports.
+            env['METRICS_PORT'] = str(metrics_port + index) if metrics_port else ''
+            self.workers.append(Worker(index, shard_ids, shard_count, env))
+        self._stopping = False
+
+    def stop(self, *args):
+        self._stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        # Each process identifies its first shard immediately and the rest one
+        # interval apart, so start the next process once the previous one is done.
+        for worker in self.workers:
+            if self._stopping:
+                break
+            worker.start()
+            self._sleep(len(worker.shard_ids) * self.identify_interval)
+
+        while not self._stopping:
+            for worker in self.workers:
+                if worker.process is None or worker.process.poll() is None:
+                    continue
+                if worker.restart_at is None:
+                    # Back off exponentially unless the process had been up for a while.
+                    if time.monotonic() - worker.started_at > RESTART_BACKOFF_MAX:
+                        worker.restarts = 0
+                    delay = min(2 ** worker.restarts, RESTART_BACKOFF_MAX)
+                    worker.restarts += 1
+                    worker.restart_at = time.monotonic() + delay
+                    print(f"Bot process {worker.index} exited with {worker.process.returncode}; restarting in {delay}s")
+                elif time.monotonic() >= worker.restart_at:
+                    worker.start()
+            self._sleep(1)
+        self.shutdown()
+
+    def _sleep(self, seconds):
+        deadline = time.monotonic() + seconds
+        while not self._stopping and time.monotonic() < deadline:
+            time.sleep(min(0.2, deadline - time.monotonic()))
+
+    def shutdown(self, timeout=30):
+        running = [worker.process for worker in self.workers if worker.process and worker.process.poll() is None]
+        # SIGINT lets bot.run close the gateway connections and release leases.
+        for process in running:
+            process.send_signal(signal.SIGINT)
+        deadline = time.monotonic() + timeout
+        for process in running:
+            try:
+                process.wait(max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        print("All bot processes stopped.")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--shards', type=int, help="Total shard count (default: Discord's recommendation)")
+    parser.add_argument('--identify-interval', type=float, default=IDENTIFY_INTERVAL, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    max_concurrency = 1
+    shard_count = args.shards
+    if shard_count is None:
+        token = os.getenv('DISCORD_TOKEN')
+        if not token:
+            sys.exit("Set DISCORD_TOKEN, or pass --shards.")
+        shard_count, max_concurrency = recommended_gateway(token)
+        print(f"Discord recommends {shard_count} shard(s)")
+
+    # Migrate once here, so the processes do not race to do it.
+    from database import close_db, init_db
+
+    async def migrate():
+        try:
+            await init_db()
+        finally:
+            await close_db()
+    asyncio.run(migrate())
+
+    metrics_port = os.getenv('METRICS_PORT', '9108')
+    Cluster(shard_count, max(1, args.processes), args.identify_interval, max_concurrency,
+            int(metrics_port) if metrics_port else None).run()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import asyncio
+import contextlib
+import json
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: updates are only serialized within a process.
+    fcntl = None
+
+CONFIG_PATH = os.getenv('CONFIG_PATH', 'config.json')
+
+class ConfigStore:
+    """config.json held in memory and shared by the bot and the web interface.
+
+    Reads never touch the disk. A background thread watches the file's mtime and
+    reloads it when the other process writes it. Writes replace the file
+    atomically (temp file + rename), so a reader never sees a half-written file,
+    and merge into what is on disk under a lock file, so two processes updating
+    different keys at once do not undo each other's change.
+    """
+
+    def __init__(self, path=CONFIG_PATH, poll_interval=1.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._data = {}
+        self._stamp = None
+        self._watcher = None
+        self._reload()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _reload(self):
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        data = {}
+        if stamp is not None:
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+            except json.JSONDecodeError as e:
+                # Keep the last good copy until the file changes again.
+                print(f"Ignoring unreadable {self.path}: {e}")
+                self._stamp = stamp
+                return
+        with self._lock:
+            self._data = data
+            self._stamp = stamp
+
+    def start_watching(self):
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name='config-watcher', daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        event = threading.Event()
+        while not event.wait(self.poll_interval):
+            self._reload()
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def items(self):
+        return self._data.items()
+
+    def values(self):
+        return self._data.values()
+
+    def as_dict(self):
+        return dict(self._data)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_file(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return dict(self._data)
+
+    def update(self, changes):
+        """Merge changes into the config and write it atomically. Blocking."""
+        with self._lock, self._file_lock():
+            data = {**self._read_file(), **changes}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(prefix='.config-', suffix='.json', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(data, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._data = data
+            self._stamp = self._file_stamp()
+
+    async def update_async(self, changes):
+        await asyncio.to_thread(self.update, changes)
+
+config_store = ConfigStore()
@@ -0,0 +1,105 @@
+import asyncio
+import base64
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+import bcrypt
+from werkzeug.security import check_password_hash
+from pools import LazyProcessPool
+
+# Password hashing for the web accounts. bcrypt is slow on purpose, so hashes
+# are computed in worker processes and never on the web event loop. At most
+# HASH_QUEUE_LIMIT hashes wait for a worker; past that a login storm gets
+# CredentialServiceBusy instead of queueing without bound.
+#
+# Hashes made with a different BCRYPT_ROUNDS, or by Werkzeug before accounts
+# moved to bcrypt, still verify and are replaced on the next successful login.
+# HASH_WORKERS=0 hashes inline, on the caller's thread.
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+HASH_WORKERS = int(os.getenv('HASH_WORKERS', min(4, os.cpu_count() or 1)))
+HASH_QUEUE_LIMIT = int(os.getenv('HASH_QUEUE_LIMIT', max(HASH_WORKERS, 1) * 16))
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+
+hash_pool = LazyProcessPool(HASH_WORKERS)
+_pending = 0
+_pending_lock = threading.Lock()
+
+class CredentialServiceBusy(Exception):
+    pass
+
+def _bcrypt_input(password):
+    # bcrypt only reads the first 72 bytes; longer passwords are pre-hashed so
+    # every byte counts.
+    data = password.encode()
+    if len(data) > 72:
+        data = base64.b64encode(hashlib.sha256(data).digest())
+    return data
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(_bcrypt_input(password), bcrypt.gensalt(rounds)).decode()
+
+def _verify(password, password_hash):
+    if password_hash.startswith(BCRYPT_PREFIXES):
+        return bcrypt.checkpw(_bcrypt_input(password), password_hash.encode())
+    return check_password_hash(password_hash, password)
+
+async def _run(func, *args):
+    global _pending
+    if HASH_WORKERS == 0:
+        return func(*args)
+    with _pending_lock:
+        if _pending >= HASH_QUEUE_LIMIT:
+            raise CredentialServiceBusy(f"{_pending} password hashes are already waiting")
+        _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(hash_pool.get(), func, *args)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+async def hash_password(password):
+    return await _run(_hash, password, BCRYPT_ROUNDS)
+
+async def verify_password(password, password_hash):
+    return await _run(_verify, password, password_hash)
+
+def needs_rehash(password_hash):
+    """True if password_hash is not a bcrypt hash with the current BCRYPT_ROUNDS."""
+    if not password_hash.startswith(BCRYPT_PREFIXES):
+        return True
+    return int(password_hash.split('$')[2]) != BCRYPT_ROUNDS
+
+class SessionCache:
+    """Logged-in users by id, so Flask-Login does not hit the database on every request.
+
+    Entries expire after ttl seconds; ttl=0 turns the cache off.
+    """
+
+    def __init__(self, ttl=60, max_size=1000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, load):
+        if self.ttl <= 0:
+            return load(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                return entry[0]
+        user = load(user_id)
+        if user is not None:
+            with self._lock:
+                self._entries[user_id] = (user, time.monotonic() + self.ttl)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
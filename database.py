@@ -0,0 +1,250 @@
+import os
+import base64
+from datetime import datetime
+from dotenv import load_dotenv
+from sqlalchemy import and_, delete, func, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import joinedload, sessionmaker
+from models import User, Video, Comment, EditorRating, MakerStats, EditorRatingStats
+from migrations import pending_migrations, run_migrations
+from analytics import submission_counts
+from search import search_videos
+from metrics import instrument_engine
+from db_profiles import make_async_engine
+from tagged_cache import TAG_VIDEOS, page_cache
+from credentials import hash_password
+
+load_dotenv()
+
+# The bot and the web interface share DATABASE_URL, but the bot historically used
+# a synchronous driver URL. Map it onto the matching asyncio driver.
+def async_database_url(url):
+    if url.startswith('sqlite://'):
+        return url.replace('sqlite://', 'sqlite+aiosqlite://', 1)
+    if url.startswith('postgres://'):
+        return url.replace('postgres://', 'postgresql+asyncpg://', 1)
+    if url.startswith('postgresql://'):
+        return url.replace('postgresql://', 'postgresql+asyncpg://', 1)
+    return url
+
+# Blocking driver for the same database, used where rows are streamed from a
+# server-side cursor into a synchronous response generator.
+def sync_database_url(url):
+    return url.replace('+aiosqlite', '', 1).replace('+asyncpg', '+psycopg2', 1)
+
+DATABASE_URL = async_database_url(os.getenv('DATABASE_URL', 'sqlite:///videos.db'))
+engine = make_async_engine(DATABASE_URL)
+instrument_engine(engine, 'shared')
+async_session = sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
+async def init_db():
+    await run_migrations(engine)
+
+async def check_schema():
+    """Raise RuntimeError if migrations are pending; `python manage.py init` applies them once per deploy."""
+    pending = await pending_migrations(engine)
+    if pending:
+        raise RuntimeError(f"The database is missing migrations {', '.join(str(version) for version, _ in pending)}; "
+                           f"run `python manage.py migrate` first")
+
+# Pooled aiosqlite connections each keep a non-daemon thread alive, so every
+# process must close the pool before its event loop ends or it never exits.
+async def close_db():
+    await engine.dispose()
+
+def _insert_for(session, table):
+    if session.bind.dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+async def record_video_added(session, maker):
+    stmt = _insert_for(session, MakerStats).values(maker=maker, video_count=1)
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=['maker'],
+        set_={'video_count': MakerStats.video_count + 1}
+    ))
+
+async def record_video_removed(session, maker):
+    await session.execute(
+        update(MakerStats).where(MakerStats.maker == maker).values(video_count=MakerStats.video_count - 1)
+    )
+    await session.execute(delete(MakerStats).where(MakerStats.maker == maker, MakerStats.video_count <= 0))
+
+async def record_rating_change(session, editor_id, old_rating, new_rating):
+    if old_rating == new_rating:
+        return
+    sum_delta = new_rating - (old_rating or 0)
+    count_delta = 0 if old_rating is not None else 1
+    stmt = _insert_for(session, EditorRatingStats).values(
+        editor_id=editor_id, rating_sum=new_rating, rating_count=1, avg_rating=float(new_rating)
+    )
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=['editor_id'],
+        set_={
+            'rating_sum': EditorRatingStats.rating_sum + sum_delta,
+            'rating_count': EditorRatingStats.rating_count + count_delta,
+            'avg_rating': (EditorRatingStats.rating_sum + sum_delta) * 1.0 / (EditorRatingStats.rating_count + count_delta),
+        }
+    ))
+
+# Keyset pagination over videos, newest first. The cursor encodes the
+# (created_at, id) of the last row returned, so each page is an index range scan
+# rather than an OFFSET that grows with the page number.
+def encode_video_cursor(created_at, video_id):
+    raw = f"{created_at.isoformat()}|{video_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_video_cursor(cursor):
+    """Return (created_at, id) for a cursor string, raising ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, video_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(video_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+def video_listing_query(after=None, status=None, maker=None, limit=None):
+    query = select(Video.id, Video.title, Video.status, Video.maker, Video.created_at, Video.thumbnail_digest)
+    if status:
+        query = query.where(Video.status == status)
+    if maker:
+        query = query.where(Video.maker == maker)
+    if after:
+        created_at, video_id = after
+        query = query.where(or_(
+            Video.created_at < created_at,
+            and_(Video.created_at == created_at, Video.id < video_id)
+        ))
+    query = query.order_by(Video.created_at.desc(), Video.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+async def get_video_with_comment_stats(session, video_id):
+    """Return a row of (Video, comment_count, last_comment_at) in one query, or None."""
+    result = await session.execute(
+        select(
+            Video,
+            select(func.count(Comment.id)).where(Comment.video_id == Video.id).scalar_subquery().label('comment_count'),
+            select(func.max(Comment.created_at)).where(Comment.video_id == Video.id)
+            .scalar_subquery().label('last_comment_at')
+        ).where(Video.id == video_id)
+    )
+    return result.first()
+
+async def get_comment_page(session, video_id, offset, limit):
+    # The commenters come back in the same query, so rendering never lazy loads.
+    result = await session.execute(
+        select(Comment)
+        .options(joinedload(Comment.user))
+        .where(Comment.video_id == video_id)
+        .order_by(Comment.created_at, Comment.id)
+        .offset(offset)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+async def rebuild_aggregates():
+    async with async_session() as session:
+        await session.execute(delete(MakerStats))
+        await session.execute(MakerStats.__table__.insert().from_select(
+            ['maker', 'video_count'],
+            select(Video.maker, func.count(Video.id)).group_by(Video.maker)
+        ))
+        await session.execute(delete(EditorRatingStats))
+        await session.execute(EditorRatingStats.__table__.insert().from_select(
+            ['editor_id', 'rating_sum', 'rating_count', 'avg_rating'],
+            select(
+                EditorRating.editor_id,
+                func.sum(EditorRating.rating),
+                func.count(EditorRating.rating),
+                func.avg(EditorRating.rating)
+            ).group_by(EditorRating.editor_id)
+        ))
+        await session.commit()
+    page_cache.invalidate(TAG_VIDEOS)
+
+async def ensure_admin_user(password, username='admin'):
+    """Create the web admin account if it does not exist yet. Returns True if it was created."""
+    async with async_session() as session:
+        result = await session.execute(select(User.id).filter_by(username=username))
+        if result.scalar() is not None:
+            return False
+        session.add(User(username=username, password_hash=await hash_password(password)))
+        await session.commit()
+        return True
+
+# Every helper below opens its own session, so each command handler gets its own
+# pooled connection and a slow query only delays the interaction that issued it.
+
+async def add_video(**fields):
+    video = Video(**fields)
+    async with async_session() as session:
+        session.add(video)
+        await record_video_added(session, video.maker)
+        await session.commit()
+    page_cache.invalidate(TAG_VIDEOS)
+    return video
+
+async def get_video(video_id):
+    async with async_session() as session:
+        return await session.get(Video, video_id)
+
+async def find_videos(query, limit=10, offset=0):
+    async with async_session() as session:
+        return await search_videos(session, query, limit, offset)
+
+async def get_recent_videos(maker, limit=5):
+    async with async_session() as session:
+        result = await session.execute(
+            select(Video)
+            .filter_by(maker=maker)
+            .order_by(Video.created_at.desc())
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+async def get_top_makers(limit=10):
+    async with async_session() as session:
+        result = await session.execute(
+            select(MakerStats.maker, MakerStats.video_count)
+            .order_by(MakerStats.video_count.desc())
+            .limit(limit)
+        )
+        return result.all()
+
+async def get_monthly_video_counts():
+    async with async_session() as session:
+        counts = await submission_counts(session, 'month')
+    return [(bucket[:7], count) for bucket, count in zip(counts['buckets'], counts['counts'])]
+
+async def get_editor_rating(editor_id, rater_id):
+    async with async_session() as session:
+        return await session.get(EditorRating, (editor_id, rater_id))
+
+async def set_editor_rating(editor_id, rater_id, rating):
+    async with async_session() as session:
+        editor_rating = await session.get(EditorRating, (editor_id, rater_id))
+        if editor_rating:
+            old_rating = editor_rating.rating
+            editor_rating.rating = rating
+        else:
+            old_rating = None
+            session.add(EditorRating(editor_id=editor_id, rater_id=rater_id, rating=rating))
+        await record_rating_change(session, editor_id, old_rating, rating)
+        await session.commit()
+
+async def get_top_editors(limit=10):
+    async with async_session() as session:
+        result = await session.execute(
+            select(EditorRatingStats.editor_id, EditorRatingStats.avg_rating, EditorRatingStats.rating_count)
+            .order_by(EditorRatingStats.avg_rating.desc(), EditorRatingStats.rating_count.desc())
+            .limit(limit)
+        )
+        return result.all()
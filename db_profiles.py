@@ -0,0 +1,104 @@
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+# Engine settings per deployment, selected with DB_PROFILE. Every engine in the
+# bot, the web interface and manage.py is created here, so they all open the
+# database the same way.
+#
+# On SQLite the pragmas run on every new connection. WAL lets readers carry on
+# while another process writes, and busy_timeout makes a writer wait for the
+# lock instead of failing with "database is locked". With WAL, synchronous=NORMAL
+# still never corrupts the database; a power cut can lose the last commits.
+
+PROFILES = {
+    'default': {
+        'echo': False,
+        'sqlite': {
+            'pragmas': {
+                'busy_timeout': 5000,
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'cache_size': -16384,  # KiB, per connection
+                'mmap_size': 268435456,
+                'temp_store': 'MEMORY',
+            },
+            'pool_size': 5,
+            'max_overflow': 10,
+        },
+        'postgresql': {
+            'pool_size': 10,
+            'max_overflow': 20,
+            'pool_timeout': 30,
+            'pool_recycle': 1800,
+            'pool_pre_ping': True,
+        },
+    },
+    # Driver defaults: no pragmas, SQLAlchemy's default pools. For SQLite files
+    # on a network filesystem, where WAL cannot work.
+    'compat': {
+        'echo': False,
+        'sqlite': {'pragmas': {}},
+        'postgresql': {},
+    },
+}
+PROFILES['development'] = {**PROFILES['default'], 'echo': True}
+
+def current_profile():
+    name = os.getenv('DB_PROFILE', 'default')
+    if name not in PROFILES:
+        raise ValueError(f"DB_PROFILE must be one of {', '.join(PROFILES)}, not {name!r}")
+    return PROFILES[name]
+
+def _is_sqlite_file(url):
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+def _engine_options(url, profile, pooled, asynchronous):
+    options = {'echo': profile['echo']}
+    backend = make_url(url).get_backend_name()
+    if not pooled:
+        options['poolclass'] = NullPool
+    elif backend == 'sqlite':
+        settings = profile['sqlite']
+        # SQLAlchemy 1.4 only pools SQLite files when asked to.
+        if _is_sqlite_file(url) and 'pool_size' in settings:
+            options['poolclass'] = AsyncAdaptedQueuePool if asynchronous else QueuePool
+            options['pool_size'] = settings['pool_size']
+            options['max_overflow'] = settings['max_overflow']
+            if not asynchronous:
+                options['connect_args'] = {'check_same_thread': False}
+    elif backend == 'postgresql':
+        options.update(profile['postgresql'])
+    for name in ('pool_size', 'max_overflow'):
+        value = os.getenv(f"DB_{name.upper()}")
+        if value and name in options:
+            options[name] = int(value)
+    return options
+
+def _apply_pragmas(engine, url, pragmas):
+    if not pragmas or not _is_sqlite_file(url):
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def make_async_engine(url, pooled=True):
+    """An AsyncEngine for url with the DB_PROFILE settings. pooled=False never reuses connections."""
+    profile = current_profile()
+    engine = create_async_engine(url, **_engine_options(url, profile, pooled, asynchronous=True))
+    _apply_pragmas(engine.sync_engine, url, profile['sqlite']['pragmas'])
+    return engine
+
+def make_sync_engine(url, pooled=True):
+    """Like make_async_engine, for a blocking driver URL (see database.sync_database_url)."""
+    profile = current_profile()
+    engine = create_engine(url, **_engine_options(url, profile, pooled, asynchronous=False))
+    _apply_pragmas(engine, url, profile['sqlite']['pragmas'])
+    return engine
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from collections import deque
+import discord
+from metrics import observe_discord_send
+
+# Discord accepts at most 10 embeds and 6000 embed characters per message.
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+class TokenBucket:
+    def __init__(self, rate, per):
+        self.capacity = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / self.per)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) * self.per / self.capacity)
+
+class MessageDispatcher:
+    """Queues outbound embeds per channel and sends them in batches at a pace Discord accepts.
+
+    Each channel has its own queue and sender task. A sender takes as many queued
+    embeds as fit in one message, then waits for both its channel's bucket and
+    the global bucket before sending. Bursts therefore become fewer, larger
+    messages instead of 429 responses.
+    """
+
+    def __init__(self, bot, channel_rate=5, channel_per=5.0, global_rate=50, global_per=1.0):
+        self.bot = bot
+        self.channel_rate = channel_rate
+        self.channel_per = channel_per
+        self.global_bucket = TokenBucket(global_rate, global_per)
+        self._queues = {}
+        self._buckets = {}
+        self._wakeups = {}
+        self._tasks = {}
+
+    def send_embed(self, channel_id, embed):
+        """Queue an embed for a channel. Returns a future resolved with the message that carried it."""
+        channel_id = int(channel_id)
+        future = asyncio.get_running_loop().create_future()
+        # Callers usually don't await delivery; failures are already logged by the sender.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        if channel_id not in self._queues:
+            self._queues[channel_id] = deque()
+            self._buckets[channel_id] = TokenBucket(self.channel_rate, self.channel_per)
+            self._wakeups[channel_id] = asyncio.Event()
+        self._queues[channel_id].append((embed, future, time.monotonic()))
+        self._wakeups[channel_id].set()
+        task = self._tasks.get(channel_id)
+        if task is None or task.done():
+            self._tasks[channel_id] = asyncio.create_task(self._sender(channel_id))
+        return future
+
+    def _take_batch(self, queue):
+        batch, chars = [], 0
+        while queue and len(batch) < MAX_EMBEDS_PER_MESSAGE:
+            size = len(queue[0][0])
+            if batch and chars + size > MAX_EMBED_CHARS_PER_MESSAGE:
+                break
+            batch.append(queue.popleft())
+            chars += size
+        return batch
+
+    async def _resolve_channel(self, channel_id):
+        return self.bot.get_channel(channel_id) or await self.bot.fetch_channel(channel_id)
+
+    async def _sender(self, channel_id):
+        queue = self._queues[channel_id]
+        wakeup = self._wakeups[channel_id]
+        while True:
+            if not queue:
+                wakeup.clear()
+                await wakeup.wait()
+            await self._buckets[channel_id].acquire()
+            await self.global_bucket.acquire()
+            batch = self._take_batch(queue)
+            if not batch:
+                continue
+
+            started = time.monotonic()
+            try:
+                channel = await self._resolve_channel(channel_id)
+                message = await channel.send(embeds=[embed for embed, _, _ in batch])
+            except Exception as e:
+                rate_limited = isinstance(e, discord.HTTPException) and e.status == 429
+                observe_discord_send('rate_limited' if rate_limited else 'error', time.monotonic() - started)
+                print(f"Could not send {len(batch)} embed(s) to channel {channel_id}: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            now = time.monotonic()
+            observe_discord_send('ok', now - started, now - min(queued for _, _, queued in batch))
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_result(message)
+
+    def queue_depth(self, channel_id=None):
+        if channel_id is not None:
+            return len(self._queues.get(int(channel_id), ()))
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def close(self):
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks = {}
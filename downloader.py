@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import aiohttp
+
+# Parallel ranged HTTP downloads. A file is split into fixed-size ranges that a
+# few workers fetch concurrently and write in place into a preallocated
+# `<filename>.part`. Finished ranges are recorded in `<filename>.part.json`, so
+# an interrupted download only refetches what is missing. The server's ETag or
+# Last-Modified is recorded with them and sent as If-Range, so a file that changed
+# in between is downloaded again rather than stitched together from two versions.
+
+RANGE_SIZE = 8 * 1024 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+MAX_ATTEMPTS = 3
+
+class DownloadError(Exception):
+    pass
+
+class SourceChanged(DownloadError):
+    pass
+
+class DownloadLimiter:
+    """Caps concurrent connections and total bandwidth across every download in the process."""
+
+    def __init__(self, max_connections=8, max_bytes_per_sec=None):
+        self.connections = asyncio.Semaphore(max_connections)
+        self.max_bytes_per_sec = max_bytes_per_sec
+        self._allowance = max_bytes_per_sec or 0
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def throttle(self, nbytes):
+        if not self.max_bytes_per_sec:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._allowance = min(
+                    self.max_bytes_per_sec,
+                    self._allowance + (now - self._last_refill) * self.max_bytes_per_sec
+                )
+                self._last_refill = now
+                if self._allowance >= nbytes or self._allowance >= self.max_bytes_per_sec:
+                    self._allowance -= nbytes
+                    return
+                await asyncio.sleep((nbytes - self._allowance) / self.max_bytes_per_sec)
+
+_default_limiter = None
+
+def default_limiter():
+    global _default_limiter
+    if _default_limiter is None:
+        max_bytes_per_sec = os.getenv('DOWNLOAD_MAX_BYTES_PER_SEC')
+        _default_limiter = DownloadLimiter(
+            max_connections=int(os.getenv('DOWNLOAD_MAX_CONNECTIONS', 8)),
+            max_bytes_per_sec=float(max_bytes_per_sec) if max_bytes_per_sec else None
+        )
+    return _default_limiter
+
+def _load_progress(state_path, url, size, validator):
+    # Without a validator there is no telling whether the file changed, so it starts over.
+    if validator and os.path.exists(state_path):
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+        if state.get('url') == url and state.get('size') == size and state.get('validator') == validator:
+            return state
+    return {'url': url, 'size': size, 'validator': validator, 'done': []}
+
+def _save_progress(state_path, state):
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+def _file_digest(path, algorithm):
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _validator(headers):
+    # If-Range only accepts a strong ETag.
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return headers.get('Last-Modified')
+
+async def _probe(http, url, limiter):
+    """Return (final_url, size, accepts_ranges, validator) for a URL, following redirects."""
+    async with limiter.connections:
+        async with http.get(url, headers={'Range': 'bytes=0-0'}) as response:
+            response.raise_for_status()
+            final_url = str(response.url)
+            if response.status == 206:
+                match = re.match(r'bytes \d+-\d+/(\d+)', response.headers.get('Content-Range', ''))
+                if match:
+                    return final_url, int(match.group(1)), True, _validator(response.headers)
+            size = response.headers.get('Content-Length')
+            return final_url, int(size) if size is not None else None, False, None
+
+async def _write_at(fd, data, offset):
+    write = asyncio.get_running_loop().run_in_executor(None, os.pwrite, fd, data, offset)
+    try:
+        await asyncio.shield(write)
+    except asyncio.CancelledError:
+        # The thread cannot be stopped; let it finish before the caller closes fd.
+        await asyncio.wait({write})
+        raise
+
+async def _fetch_range(http, url, fd, start, end, limiter, headers=None):
+    headers = {**(headers or {}), 'Range': f'bytes={start}-{end}'}
+    async with limiter.connections:
+        async with http.get(url, headers=headers) as response:
+            if response.status == 200 and 'If-Range' in headers:
+                raise SourceChanged(f"{url} changed on the server during the download")
+            if response.status != 206:
+                raise DownloadError(f"Server ignored range request for bytes {start}-{end} (HTTP {response.status})")
+            offset = start
+            buffer = bytearray()
+            async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                await limiter.throttle(len(chunk))
+                buffer += chunk
+                if len(buffer) >= WRITE_BUFFER_SIZE:
+                    await _write_at(fd, bytes(buffer), offset)
+                    offset += len(buffer)
+                    buffer.clear()
+            if buffer:
+                await _write_at(fd, bytes(buffer), offset)
+                offset += len(buffer)
+    if offset != end + 1:
+        raise DownloadError(f"Short read for bytes {start}-{end}: got {offset - start} bytes")
+
+async def _download_whole(http, url, part_path, limiter):
+    # Fallback for servers without range support: a single sequential stream.
+    loop = asyncio.get_running_loop()
+    async with limiter.connections:
+        async with http.get(url) as response:
+            response.raise_for_status()
+            with open(part_path, 'wb') as f:
+                async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                    await limiter.throttle(len(chunk))
+                    await loop.run_in_executor(None, f.write, chunk)
+
+async def download_file(url, filename, parallel=4, range_size=RANGE_SIZE, checksum=None,
+                        checksum_algorithm='sha256', limiter=None, session=None):
+    """Download url to filename with parallel HTTP Range requests, resuming any earlier partial download.
+
+    If checksum is given, the finished file must match its hex digest. Returns
+    the number of bytes in the file.
+    """
+    limiter = limiter or default_limiter()
+    part_path = f"{filename}.part"
+    state_path = f"{part_path}.json"
+    http = session or aiohttp.ClientSession()
+    try:
+        final_url, size, accepts_ranges, validator = await _probe(http, url, limiter)
+        if not accepts_ranges or size is None:
+            await _download_whole(http, final_url, part_path, limiter)
+        else:
+            state = _load_progress(state_path, url, size, validator)
+            range_headers = {'If-Range': validator} if validator else None
+            done = {tuple(r) for r in state['done']}
+            pending = [
+                (start, min(start + range_size, size) - 1)
+                for start in range(0, size, range_size)
+                if (start, min(start + range_size, size) - 1) not in done
+            ]
+
+            fd = os.open(part_path, os.O_RDWR | os.O_CREAT)
+            try:
+                os.ftruncate(fd, size)
+                queue = asyncio.Queue()
+                for byte_range in pending:
+                    queue.put_nowait(byte_range)
+
+                async def worker():
+                    while not queue.empty():
+                        start, end = queue.get_nowait()
+                        for attempt in range(1, MAX_ATTEMPTS + 1):
+                            try:
+                                await _fetch_range(http, final_url, fd, start, end, limiter, range_headers)
+                                break
+                            except (aiohttp.ClientError, asyncio.TimeoutError, DownloadError) as e:
+                                if attempt == MAX_ATTEMPTS or isinstance(e, SourceChanged):
+                                    raise
+                                await asyncio.sleep(2 ** attempt)
+                        state['done'].append([start, end])
+                        _save_progress(state_path, state)
+
+                workers = [asyncio.create_task(worker()) for _ in range(max(1, min(parallel, len(pending))))]
+                try:
+                    await asyncio.gather(*workers)
+                except BaseException as e:
+                    # Stop the other workers before fd is closed under them.
+                    for task in workers:
+                        task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+                    if isinstance(e, SourceChanged) and os.path.exists(state_path):
+                        os.remove(state_path)
+                    raise
+            finally:
+                os.close(fd)
+    finally:
+        if session is None:
+            await http.close()
+
+    actual_size = os.path.getsize(part_path)
+    if size is not None and actual_size != size:
+        raise DownloadError(f"Downloaded {actual_size} bytes, expected {size}")
+    if checksum:
+        digest = await asyncio.get_running_loop().run_in_executor(None, _file_digest, part_path, checksum_algorithm)
+        if digest != checksum.lower():
+            os.remove(part_path)
+            if os.path.exists(state_path):
+                os.remove(state_path)
+            raise DownloadError(f"Checksum mismatch for {filename}: expected {checksum}, got {digest}")
+
+    os.replace(part_path, filename)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return actual_size
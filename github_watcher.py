@@ -0,0 +1,132 @@
+import asyncio
+import json
+import os
+import time
+import aiohttp
+
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com')
+STATE_PATH = 'github_watcher_state.json'
+
+class RateLimited(Exception):
+    def __init__(self, reset_at):
+        super().__init__(f"GitHub rate limit exhausted until {reset_at}")
+        self.reset_at = reset_at
+
+class GitHubIssueWatcher:
+    """Polls a user's repositories and reports only issues opened since the last poll.
+
+    Per repository it persists the highest issue number seen, the created_at of
+    that issue (sent as `since` to keep responses small) and the ETag of the last
+    response, so an unchanged repository costs one 304 that does not count
+    against the rate limit. A repository seen for the first time is only
+    recorded, not reported, so restarting with a fresh state file does not
+    repost the backlog.
+    """
+
+    def __init__(self, token, username, state_path=STATE_PATH, api_url=GITHUB_API_URL):
+        self.token = token
+        self.username = username
+        self.state_path = state_path
+        self.api_url = api_url.rstrip('/')
+        self.state = self._load_state()
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        return {'repos_etag': None, 'repo_names': [], 'repos': {}}
+
+    def _save_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(tmp_path, self.state_path)
+
+    async def _get(self, http, url, params=None, etag=None):
+        headers = {'Accept': 'application/vnd.github+json'}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        if etag:
+            headers['If-None-Match'] = etag
+        async with http.get(url, params=params, headers=headers) as response:
+            if response.status in (403, 429) and response.headers.get('X-RateLimit-Remaining') == '0':
+                raise RateLimited(int(response.headers.get('X-RateLimit-Reset', time.time() + 60)))
+            if response.status == 304:
+                return response.status, None, etag, None
+            response.raise_for_status()
+            next_url = response.links.get('next', {}).get('url')
+            return response.status, await response.json(), response.headers.get('ETag'), next_url
+
+    async def _repo_names(self, http):
+        url = f"{self.api_url}/users/{self.username}/repos"
+        status, repos, etag, next_url = await self._get(http, url, {'per_page': 100}, self.state['repos_etag'])
+        if status == 304:
+            return self.state['repo_names']
+        names = [repo['full_name'] for repo in repos]
+        while next_url:
+            _, repos, _, next_url = await self._get(http, next_url)
+            names.extend(repo['full_name'] for repo in repos)
+        self.state['repos_etag'] = etag
+        self.state['repo_names'] = names
+        return names
+
+    async def _new_issues(self, http, repo_name):
+        repo_state = self.state['repos'].get(repo_name)
+        params = {'state': 'open', 'sort': 'created', 'direction': 'desc', 'per_page': 100}
+        if repo_state and repo_state.get('since'):
+            params['since'] = repo_state['since']
+        url = f"{self.api_url}/repos/{repo_name}/issues"
+        status, issues, etag, next_url = await self._get(http, url, params, repo_state and repo_state.get('etag'))
+        if status == 304:
+            return []
+
+        # Pull requests share the issue number sequence, so they still advance the
+        # high-water mark even though they are not reported.
+        last_number = repo_state['last_number'] if repo_state else None
+        highest = last_number or 0
+        since = repo_state['since'] if repo_state else None
+        new_issues = []
+        while True:
+            for issue in issues:
+                if last_number is not None and issue['number'] <= last_number:
+                    next_url = None
+                    break
+                if issue['number'] > highest:
+                    highest, since = issue['number'], issue['created_at']
+                if 'pull_request' not in issue:
+                    new_issues.append(issue)
+            if not next_url or last_number is None:
+                break
+            _, issues, _, next_url = await self._get(http, next_url)
+
+        self.state['repos'][repo_name] = {'last_number': highest, 'since': since, 'etag': etag}
+        if repo_state is None:
+            return []
+        return sorted(new_issues, key=lambda issue: issue['number'])
+
+    async def poll(self, on_new_issue):
+        """Check every repository once, awaiting on_new_issue(repo_name, issue) for each new issue."""
+        async with aiohttp.ClientSession() as http:
+            for repo_name in await self._repo_names(http):
+                try:
+                    issues = await self._new_issues(http, repo_name)
+                except aiohttp.ClientResponseError as e:
+                    print(f"Could not fetch issues for {repo_name}: {e.status} {e.message}")
+                    continue
+                for issue in issues:
+                    await on_new_issue(repo_name, issue)
+                await asyncio.to_thread(self._save_state)
+
+    async def run(self, on_new_issue, interval=300):
+        while True:
+            try:
+                await self.poll(on_new_issue)
+            except RateLimited as e:
+                print(f"GitHub rate limit reached, pausing until {e.reset_at}")
+                await asyncio.sleep(max(e.reset_at - time.time(), interval))
+                continue
+            except Exception as e:
+                # Anything else is logged and retried next interval rather than ending
+                # the task; cancellation is not an Exception and still stops it.
+                print(f"An unexpected error occurred while polling GitHub: {e!r}")
+            await asyncio.sleep(interval)
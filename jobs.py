@@ -0,0 +1,246 @@
+import asyncio
+import os
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, or_, update
+from sqlalchemy.future import select
+from database import async_session
+from models import Job, Video
+from tagged_cache import TAG_VIDEOS, page_cache
+
+# Durable job queue for the video production pipeline. Each stage of a video is
+# a row in `jobs`. Workers lease a row by setting leased_by/lease_expires_at;
+# a lease that is not renewed expires and the job becomes claimable again, so
+# a crash never loses work. Completing a stage and enqueueing the next one
+# happen in one transaction that only succeeds for the lease holder, so a
+# restart never duplicates work either.
+
+STAGES = ['download', 'transcode_check', 'thumbnail', 'upload']
+NEXT_STAGE = dict(zip(STAGES, STAGES[1:]))
+STAGE_VIDEO_STATUS = {
+    'download': 'downloading',
+    'transcode_check': 'checking',
+    'thumbnail': 'preparing thumbnail',
+    'upload': 'uploading',
+}
+ACTIVE_STATUSES = ('queued', 'running')
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 3600
+
+class PipelineBusy(Exception):
+    pass
+
+def _claimable(now):
+    return or_(
+        and_(Job.status == 'queued', Job.run_at <= now),
+        and_(Job.status == 'running', Job.lease_expires_at < now, Job.attempts < Job.max_attempts)
+    )
+
+def _abandoned(now):
+    # The last allowed attempt never finished, e.g. because it crashed the process.
+    return and_(Job.status == 'running', Job.lease_expires_at < now, Job.attempts >= Job.max_attempts)
+
+async def _fail_abandoned_jobs(session, now):
+    video_ids = (await session.execute(select(Job.video_id).where(_abandoned(now)))).scalars().all()
+    if not video_ids:
+        return False
+    await session.execute(
+        update(Job).where(_abandoned(now)).values(
+            status='failed', finished_at=now, leased_by=None, lease_expires_at=None,
+            last_error='The lease expired on the last attempt'
+        ).execution_options(synchronize_session=False)
+    )
+    await session.execute(update(Video).where(Video.id.in_(video_ids)).values(status='failed'))
+    await session.commit()
+    return True
+
+async def enqueue_pipeline(video_id, priority=0, max_attempts=5):
+    """Queue the first pipeline stage for a video, replacing the jobs of any earlier finished run."""
+    async with async_session() as session:
+        active = await session.execute(
+            select(Job.id).where(Job.video_id == video_id, Job.status.in_(ACTIVE_STATUSES)).limit(1)
+        )
+        if active.scalar() is not None:
+            raise PipelineBusy(f"Video {video_id} is already being processed")
+        await session.execute(delete(Job).where(Job.video_id == video_id))
+        job = Job(video_id=video_id, stage=STAGES[0], priority=priority, max_attempts=max_attempts)
+        session.add(job)
+        await session.execute(update(Video).where(Video.id == video_id).values(status='queued'))
+        await session.commit()
+    page_cache.invalidate(TAG_VIDEOS)
+    return job.id
+
+async def claim_job(worker_id, lease_seconds):
+    now = datetime.utcnow()
+    async with async_session() as session:
+        if await _fail_abandoned_jobs(session, now):
+            page_cache.invalidate(TAG_VIDEOS)
+        job_id = (await session.execute(
+            select(Job.id).where(_claimable(now))
+            .order_by(Job.priority.desc(), Job.run_at, Job.id)
+            .limit(1)
+        )).scalar()
+        if job_id is None:
+            return None
+        # Re-check the condition in the UPDATE so two workers racing for the
+        # same row cannot both win it.
+        result = await session.execute(
+            update(Job).where(Job.id == job_id, _claimable(now)).values(
+                status='running',
+                leased_by=worker_id,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                attempts=Job.attempts + 1,
+                started_at=now,
+            ).execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            await session.rollback()
+            return None
+        job = await session.get(Job, job_id)
+        await session.execute(
+            update(Video).where(Video.id == job.video_id).values(status=STAGE_VIDEO_STATUS[job.stage])
+        )
+        await session.commit()
+    page_cache.invalidate(TAG_VIDEOS)
+    return job
+
+async def renew_lease(job_id, worker_id, lease_seconds):
+    async with async_session() as session:
+        result = await session.execute(
+            update(Job).where(Job.id == job_id, Job.leased_by == worker_id, Job.status == 'running')
+            .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds))
+        )
+        await session.commit()
+        return result.rowcount == 1
+
+async def complete_job(job, worker_id, duration, video_updates=None):
+    """Mark a leased job done and enqueue the next stage. Returns False if the lease was lost."""
+    async with async_session() as session:
+        result = await session.execute(
+            update(Job).where(Job.id == job.id, Job.leased_by == worker_id, Job.status == 'running')
+            .values(status='done', finished_at=datetime.utcnow(), duration=duration, last_error=None)
+        )
+        if result.rowcount != 1:
+            await session.rollback()
+            return False
+        next_stage = NEXT_STAGE.get(job.stage)
+        values = dict(video_updates or {})
+        if next_stage:
+            session.add(Job(video_id=job.video_id, stage=next_stage, priority=job.priority,
+                            max_attempts=job.max_attempts))
+        else:
+            values['status'] = 'completed'
+        if values:
+            await session.execute(update(Video).where(Video.id == job.video_id).values(**values))
+        await session.commit()
+    page_cache.invalidate(TAG_VIDEOS)
+    return True
+
+async def fail_job(job, worker_id, error):
+    async with async_session() as session:
+        if job.attempts >= job.max_attempts:
+            values = {'status': 'failed', 'finished_at': datetime.utcnow()}
+        else:
+            delay = min(RETRY_BASE_DELAY * 2 ** (job.attempts - 1), RETRY_MAX_DELAY)
+            values = {'status': 'queued', 'run_at': datetime.utcnow() + timedelta(seconds=delay)}
+        result = await session.execute(
+            update(Job).where(Job.id == job.id, Job.leased_by == worker_id, Job.status == 'running')
+            .values(leased_by=None, lease_expires_at=None, last_error=error, **values)
+        )
+        if result.rowcount == 1 and values['status'] == 'failed':
+            await session.execute(update(Video).where(Video.id == job.video_id).values(status='failed'))
+        await session.commit()
+    if values['status'] == 'failed':
+        page_cache.invalidate(TAG_VIDEOS)
+
+async def get_stage_timings(video_id):
+    async with async_session() as session:
+        result = await session.execute(
+            select(Job.stage, Job.status, Job.attempts, Job.duration).where(Job.video_id == video_id)
+        )
+        rows = {row.stage: row for row in result.all()}
+    return [rows[stage] for stage in STAGES if stage in rows]
+
+class JobWorkerPool:
+    """Runs `concurrency` workers that claim jobs and run handlers[stage](video) for them.
+
+    A handler may return a dict of Video column updates, applied in the same
+    transaction that completes its job.
+    """
+
+    def __init__(self, handlers, concurrency=4, poll_interval=2, lease_seconds=300):
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks = []
+
+    def start(self):
+        for n in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._worker(f"{self.worker_prefix}:{n}")))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _handle(self, job):
+        async with async_session() as session:
+            video = await session.get(Video, job.video_id)
+        return await self.handlers[job.stage](video)
+
+    async def _worker(self, worker_id):
+        while True:
+            try:
+                job = await claim_job(worker_id, self.lease_seconds)
+            except Exception as e:
+                print(f"Job worker {worker_id} could not claim a job: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self._run(job, worker_id)
+
+    async def _run(self, job, worker_id):
+        started = time.monotonic()
+        handler = asyncio.create_task(self._handle(job))
+        try:
+            # Renew the lease while the handler runs. Once it is lost another
+            # worker may claim the job, so the handler is stopped rather than
+            # left to run alongside the new attempt.
+            while True:
+                await asyncio.wait({handler}, timeout=self.lease_seconds / 3)
+                if handler.done():
+                    break
+                try:
+                    renewed = await renew_lease(job.id, worker_id, self.lease_seconds)
+                except Exception as e:
+                    print(f"Job {job.id} could not renew its lease: {e!r}")
+                    renewed = False
+                if not renewed:
+                    print(f"Job {job.id} ({job.stage} for video {job.video_id}) lost its lease and was stopped")
+                    return
+        finally:
+            # Also on shutdown: the lease is left to expire so another worker retries the job.
+            if not handler.done():
+                handler.cancel()
+                await asyncio.gather(handler, return_exceptions=True)
+
+        if handler.cancelled() or handler.exception() is not None:
+            if handler.cancelled():
+                error = 'The handler was cancelled'
+            else:
+                e = handler.exception()
+                error = ''.join(traceback.format_exception(type(e), e, e.__traceback__))
+            print(f"Job {job.id} ({job.stage} for video {job.video_id}) failed on attempt {job.attempts}:\n{error}")
+            await fail_job(job, worker_id, error)
+            return
+        duration = time.monotonic() - started
+        if await complete_job(job, worker_id, duration, handler.result()):
+            print(f"Job {job.id} ({job.stage} for video {job.video_id}) finished in {duration:.1f}s")
+        else:
+            print(f"Job {job.id} lost its lease before finishing; its result was discarded")
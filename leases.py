@@ -0,0 +1,95 @@
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+from database import async_session
+from models import Lease
+
+# Leader election for background loops that must run once per deployment, not
+# once per bot process (e.g. the GitHub issue poller). A process leads while it
+# holds the named row in `leases` and keeps renewing it; if it stops renewing
+# (crash, hang, lost database), the lease expires and another process takes
+# over. Like the job leases in jobs.py, expiry compares the processes' own
+# clocks, so they must be kept in sync.
+
+LEASE_SECONDS = int(os.getenv('LEADER_LEASE_SECONDS', 30))
+
+class LeaderLease:
+    def __init__(self, name, ttl=LEASE_SECONDS, holder=None):
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}"
+
+    async def acquire(self):
+        """Take or renew the lease. Returns True if this process holds it afterwards."""
+        now = datetime.utcnow()
+        async with async_session() as session:
+            result = await session.execute(
+                update(Lease).where(Lease.name == self.name, or_(Lease.holder == self.holder, Lease.expires_at < now))
+                .values(holder=self.holder, expires_at=now + timedelta(seconds=self.ttl))
+            )
+            if result.rowcount == 1:
+                await session.commit()
+                return True
+            if (await session.execute(select(Lease.name).where(Lease.name == self.name))).scalar() is not None:
+                return False
+            session.add(Lease(name=self.name, holder=self.holder, expires_at=now + timedelta(seconds=self.ttl)))
+            try:
+                await session.commit()
+            except IntegrityError:
+                # Another process created it first.
+                return False
+            return True
+
+    async def release(self):
+        async with async_session() as session:
+            await session.execute(
+                update(Lease).where(Lease.name == self.name, Lease.holder == self.holder)
+                .values(holder=None, expires_at=datetime.utcnow())
+            )
+            await session.commit()
+
+    async def _try_acquire(self):
+        try:
+            return await self.acquire()
+        except Exception as e:
+            # Without the database we cannot know whether we still lead, so act as if we don't.
+            print(f"Could not renew the {self.name} lease: {e}")
+            return False
+
+    async def run(self, job):
+        """Run job() whenever this process holds the lease, for as long as it holds it.
+
+        The job is cancelled as soon as a renewal fails. If it returns or raises,
+        the lease is released and contested again after a pause.
+        """
+        interval = self.ttl / 3
+        while True:
+            if not await self._try_acquire():
+                await asyncio.sleep(interval)
+                continue
+            print(f"{self.holder} is now running {self.name}")
+            task = asyncio.create_task(job())
+            try:
+                while True:
+                    await asyncio.wait({task}, timeout=interval)
+                    if task.done():
+                        if not task.cancelled() and task.exception() is not None:
+                            print(f"{self.name} stopped with an error: {task.exception()!r}")
+                        break
+                    if not await self._try_acquire():
+                        print(f"{self.holder} lost the {self.name} lease")
+                        task.cancel()
+                        break
+            finally:
+                if not task.done():
+                    task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                try:
+                    await self.release()
+                except Exception as e:
+                    print(f"Could not release the {self.name} lease: {e}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import threading
+
+class EventLoopThread:
+    """One asyncio event loop, running forever in a daemon thread, that other threads hand coroutines to.
+
+    The thread starts on first use rather than at import, so a server that
+    forks its workers after importing the app gets one loop per worker.
+    on_stop() runs on the loop when the interpreter shuts down.
+    """
+
+    def __init__(self, name='event-loop', on_start=None, on_stop=None):
+        self.name = name
+        self.on_start = on_start
+        self.on_stop = on_stop
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.loop = asyncio.new_event_loop()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self.loop.run_forever, name=self.name, daemon=True)
+            self._thread.start()
+            if self.on_start is not None:
+                asyncio.run_coroutine_threadsafe(self.on_start(), self.loop)
+            # Like concurrent.futures, run before non-daemon threads (such as
+            # aiosqlite's connection threads) are joined; atexit would be too late.
+            threading._register_atexit(self.stop)
+
+    def stop(self, timeout=10):
+        # A forked child (e.g. a process pool worker) inherits this hook but not the loop.
+        if self._thread is None or self._pid != os.getpid() or not self.loop.is_running():
+            return
+        if self.on_stop is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self.on_stop(), self.loop).result(timeout)
+            except Exception as e:
+                print(f"{self.name} could not shut down cleanly: {e!r}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def run(self, coro):
+        """Run coro on the loop and block until it finishes, returning its result or raising its exception.
+
+        The coroutine sees a copy of the caller's contextvars, which is how
+        Flask's request context reaches it.
+        """
+        if self._thread is None:
+            self._start()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError(f"{self.name} cannot block waiting for itself")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import os
+import sys
+from database import close_db, engine, ensure_admin_user, init_db, rebuild_aggregates
+from migrations import run_migrations
+
+async def cmd_migrate(args):
+    applied = await run_migrations(engine)
+    if applied:
+        print(f"Applied migrations: {', '.join(str(version) for version in applied)}")
+    else:
+        print("Database schema is up to date.")
+
+async def cmd_init(args):
+    await cmd_migrate(args)
+    if await ensure_admin_user(os.getenv('ADMIN_PASSWORD') or 'admin_password'):
+        print("Created the admin web account.")
+
+async def cmd_rebuild_aggregates(args):
+    await init_db()
+    await rebuild_aggregates()
+    print("Leaderboard aggregates rebuilt.")
+
+def _open(path, mode):
+    if path == '-':
+        return open(sys.stdin.fileno() if 'r' in mode else sys.stdout.fileno(), mode, newline='', closefd=False)
+    return open(path, mode, newline='', encoding='utf-8')
+
+async def cmd_import(args):
+    from sqlalchemy.exc import IntegrityError
+    from bulk import RowError, detect_format, import_rows
+    await init_db()
+    try:
+        with _open(args.path, 'r') as f:
+            imported, rejected = await asyncio.to_thread(
+                import_rows, args.table, f, detect_format(args.path, args.format), args.batch_size, args.strict
+            )
+    except RowError:
+        sys.exit("Import stopped at the first invalid row (--strict). Batches before it were kept.")
+    except IntegrityError as e:
+        sys.exit(f"Import stopped: {e.orig}. Batches before the failing one were kept.")
+    finally:
+        # Batches already committed count towards the leaderboards even when the import stops.
+        await rebuild_aggregates()
+    print(f"Imported {imported} {args.table}; rejected {rejected} invalid rows.")
+
+async def cmd_export(args):
+    from bulk import detect_format, export_rows
+    await init_db()
+    with _open(args.path, 'w') as f:
+        exported = await asyncio.to_thread(export_rows, args.table, f, detect_format(args.path, args.format), args.batch_size)
+    print(f"Exported {exported} {args.table}.", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance commands for the video manager database.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('init', help="Apply migrations and create the admin web account (run once per deploy)") \
+        .set_defaults(func=cmd_init)
+    subparsers.add_parser('migrate', help="Apply pending schema migrations") \
+        .set_defaults(func=cmd_migrate)
+    subparsers.add_parser('rebuild-aggregates', help="Recompute the leaderboard aggregate tables from scratch") \
+        .set_defaults(func=cmd_rebuild_aggregates)
+
+    import_parser = subparsers.add_parser('import', help="Bulk-load videos or ratings from a CSV or NDJSON file")
+    import_parser.add_argument('table', choices=['videos', 'ratings'])
+    import_parser.add_argument('path', help="Input file, or - for stdin")
+    import_parser.add_argument('--format', choices=['csv', 'ndjson'], help="Defaults to the file extension")
+    import_parser.add_argument('--batch-size', type=int, default=10000)
+    import_parser.add_argument('--strict', action='store_true', help="Stop at the first invalid row instead of skipping it")
+    import_parser.set_defaults(func=cmd_import)
+
+    export_parser = subparsers.add_parser('export', help="Stream a table to a CSV or NDJSON file")
+    export_parser.add_argument('table', choices=['videos', 'ratings', 'comments'])
+    export_parser.add_argument('path', help="Output file, or - for stdout")
+    export_parser.add_argument('--format', choices=['csv', 'ndjson'], help="Defaults to the file extension")
+    export_parser.add_argument('--batch-size', type=int, default=10000)
+    export_parser.set_defaults(func=cmd_export)
+
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+async def run(args):
+    try:
+        await args.func(args)
+    finally:
+        await close_db()
+
+if __name__ == '__main__':
+    main()
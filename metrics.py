@@ -0,0 +1,315 @@
+import asyncio
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from sqlalchemy import event
+
+# In-process metrics exported in the Prometheus text format (version 0.0.4).
+# The bot serves them from a small local HTTP server (start_metrics_server),
+# the web interface from its /metrics route.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, extra, value in self.samples():
+            lines.append(f"{name}{_format_labels(self.label_names, key, extra)} {_format_value(value)}")
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function, **labels):
+        """Compute the gauge from function() each time metrics are collected."""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = function
+
+    def samples(self):
+        samples = super().samples()
+        with self._lock:
+            functions = list(self._functions.items())
+        for key, function in functions:
+            try:
+                samples.append((self.name, key, (), function()))
+            except Exception as e:
+                print(f"Could not collect {self.name}: {e}")
+        return samples
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in values:
+            for bound, count in zip(self.buckets, counts):
+                samples.append((f"{self.name}_bucket", key, (('le', _format_value(bound)),), count))
+            samples.append((f"{self.name}_count", key, (), counts[-1]))
+            samples.append((f"{self.name}_sum", key, (), total))
+        return samples
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter, name, documentation, labels)
+
+    def gauge(self, name, documentation, labels=()):
+        return self._register(Gauge, name, documentation, labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labels, buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+command_latency = REGISTRY.histogram(
+    'bot_command_duration_seconds', "Time spent handling a slash command.", ['command', 'status'])
+request_latency = REGISTRY.histogram(
+    'web_request_duration_seconds', "Time spent handling a web request.", ['route', 'method', 'status'])
+db_queries = REGISTRY.counter(
+    'db_queries_total', "SQL statements executed.", ['engine', 'operation'])
+db_errors = REGISTRY.counter(
+    'db_query_errors_total', "SQL statements that raised an error.", ['engine'])
+db_latency = REGISTRY.histogram(
+    'db_query_duration_seconds', "Time spent executing SQL statements.", ['engine', 'operation'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+loop_lag = REGISTRY.gauge(
+    'event_loop_lag_seconds', "How late the most recent event loop probe woke up.", ['loop'])
+loop_lag_histogram = REGISTRY.histogram(
+    'event_loop_lag_distribution_seconds', "How late event loop probes woke up.", ['loop'],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+pool_queue_depth = REGISTRY.gauge(
+    'thread_pool_queue_depth', "Tasks waiting for a thread in an executor.", ['pool'])
+pool_threads = REGISTRY.gauge(
+    'thread_pool_threads', "Threads started by an executor.", ['pool'])
+queue_depth = REGISTRY.gauge(
+    'queue_depth', "Items waiting in an in-process queue.", ['queue'])
+discord_send_latency = REGISTRY.histogram(
+    'discord_send_duration_seconds', "Time spent sending one batched message to Discord.", ['status'])
+discord_queue_wait = REGISTRY.histogram(
+    'discord_queue_wait_seconds', "How long the oldest embed in a sent batch waited in the outbound queue.",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+
+# Commands and routes are recorded under their registered names, never raw
+# paths, so label cardinality stays bounded.
+
+def observe_command(command, status, seconds):
+    command_latency.observe(seconds, command=command, status=status)
+
+def observe_request(route, method, status, seconds):
+    request_latency.observe(seconds, route=route, method=method, status=status)
+
+def observe_discord_send(status, seconds, queued_seconds=None):
+    discord_send_latency.observe(seconds, status=status)
+    if queued_seconds is not None:
+        discord_queue_wait.observe(queued_seconds)
+
+_OPERATION = re.compile(r'\s*(\w+)')
+
+def instrument_engine(engine, name):
+    """Count and time every statement run through engine (sync or async)."""
+    sync_engine = getattr(engine, 'sync_engine', engine)
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_started'].pop()
+        match = _OPERATION.match(statement)
+        operation = match.group(1).upper() if match else 'OTHER'
+        db_queries.inc(engine=name, operation=operation)
+        db_latency.observe(elapsed, engine=name, operation=operation)
+
+    @event.listens_for(sync_engine, 'handle_error')
+    def handle_error(context):
+        started = context.connection.info.get('metrics_started') if context.connection is not None else None
+        if started:
+            started.pop()
+        db_errors.inc(engine=name)
+
+def watch_thread_pool(name, executor):
+    # ThreadPoolExecutor has no public accessors for these.
+    pool_queue_depth.set_function(lambda: executor._work_queue.qsize(), pool=name)
+    pool_threads.set_function(lambda: len(executor._threads), pool=name)
+
+def watch_queue(name, depth):
+    queue_depth.set_function(depth, queue=name)
+
+async def monitor_event_loop(name, interval=0.5):
+    """Measure how late asyncio.sleep(interval) wakes up; anything above zero is time the loop was blocked."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        loop_lag.set(lag, loop=name)
+        loop_lag_histogram.observe(lag, loop=name)
+
+class SamplingProfiler:
+    """Samples the stacks of every thread at a fixed interval while running.
+
+    report() returns the samples in collapsed-stack format ("frame;frame;frame
+    count" per line), which flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stacks = StackCounter()
+        self._thread = None
+        self._stop = threading.Event()
+        self.interval = None
+        self.started_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=0.005):
+        with self._lock:
+            if self.running:
+                return False
+            self._stacks = StackCounter()
+            self._stop = threading.Event()
+            self.interval = interval
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        with self._lock:
+            thread = self._thread
+            self._stop.set()
+        if thread is not None:
+            thread.join()
+        return self.report()
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                with self._lock:
+                    self._stacks[';'.join(reversed(stack))] += 1
+
+    def report(self, limit=None):
+        with self._lock:
+            stacks = self._stacks.most_common(limit)
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks)
+
+profiler = SamplingProfiler()
+
+async def start_metrics_server(host='127.0.0.1', port=9108):
+    """Serve /metrics and the profiler controls over HTTP. Returns the aiohttp runner."""
+    from aiohttp import web
+
+    async def metrics_handler(request):
+        return web.Response(body=REGISTRY.render().encode(), headers={'Content-Type': CONTENT_TYPE})
+
+    async def profiler_start(request):
+        interval = float(request.query.get('interval', 0.005))
+        started = profiler.start(interval)
+        return web.Response(text="Profiler started.\n" if started else "Profiler is already running.\n")
+
+    async def profiler_stop(request):
+        report = await asyncio.to_thread(profiler.stop)
+        return web.Response(text=report)
+
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+    app.router.add_post('/profiler/start', profiler_start)
+    app.router.add_post('/profiler/stop', profiler_stop)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,143 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, MetaData, Table, inspect, select, text
+from models import Base
+
+# Applied migrations are recorded here. Every migration must also be safe to
+# re-run against a database that already has its changes (e.g. one created by
+# an older create_all), so each step checks before it creates.
+migration_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', migration_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+def _create_tables(conn, *names):
+    tables = [Base.metadata.tables[name] for name in names]
+    Base.metadata.create_all(conn, tables=tables, checkfirst=True)
+
+def _create_indexes(conn, table_name, *index_names):
+    # By name: the model's other indexes may cover columns a later migration adds.
+    existing = {index['name'] for index in inspect(conn).get_indexes(table_name)}
+    indexes = {index.name: index for index in Base.metadata.tables[table_name].indexes}
+    for name in index_names:
+        if name not in existing:
+            indexes[name].create(conn)
+
+def _add_columns(conn, table_name, *column_names):
+    existing = {column['name'] for column in inspect(conn).get_columns(table_name)}
+    table = Base.metadata.tables[table_name]
+    for name in column_names:
+        if name not in existing:
+            column_type = table.c[name].type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE "{table_name}" ADD COLUMN {name} {column_type}'))
+
+def initial_schema(conn):
+    _create_tables(conn, 'user', 'video', 'editor_ratings', 'comment')
+
+def leaderboard_aggregates(conn):
+    _create_tables(conn, 'maker_stats', 'editor_rating_stats')
+
+def video_and_comment_indexes(conn):
+    _create_indexes(conn, 'video', 'ix_video_created_at', 'ix_video_maker_created_at', 'ix_video_status_created_at')
+    _create_indexes(conn, 'comment', 'ix_comment_video_created_at')
+
+def job_queue(conn):
+    _create_tables(conn, 'jobs')
+    _create_indexes(conn, 'jobs', 'ix_jobs_claim')
+
+def video_updated_at(conn):
+    _add_columns(conn, 'video', 'updated_at')
+    conn.execute(text('UPDATE video SET updated_at = created_at WHERE updated_at IS NULL'))
+
+# Also recreated by bulk.py, which drops it while loading a batch.
+VIDEO_FTS_INSERT_TRIGGER = (
+    "CREATE TRIGGER IF NOT EXISTS video_fts_insert AFTER INSERT ON video BEGIN "
+    "INSERT INTO video_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END"
+)
+
+def video_search_index(conn):
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text(
+            "ALTER TABLE video ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED"
+        ))
+        conn.execute(text('CREATE INDEX IF NOT EXISTS ix_video_search_vector ON video USING gin (search_vector)'))
+        return
+    # External-content FTS5 index over video, kept in sync by triggers so every
+    # writer (ORM or plain UPDATE/DELETE) updates it in the same transaction.
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS video_fts USING fts5("
+        "title, description, content='video', content_rowid='id', tokenize='porter unicode61', prefix='2 3')"
+    ))
+    conn.execute(text(VIDEO_FTS_INSERT_TRIGGER))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS video_fts_delete AFTER DELETE ON video BEGIN "
+        "INSERT INTO video_fts(video_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS video_fts_update AFTER UPDATE OF title, description ON video BEGIN "
+        "INSERT INTO video_fts(video_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO video_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END"
+    ))
+    # Title matches count ten times as much as description matches.
+    conn.execute(text("INSERT INTO video_fts(video_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')"))
+    conn.execute(text("INSERT INTO video_fts(video_fts) VALUES ('rebuild')"))
+
+def leader_leases(conn):
+    _create_tables(conn, 'leases')
+
+def video_thumbnail_digest(conn):
+    _add_columns(conn, 'video', 'thumbnail_digest')
+    _create_indexes(conn, 'video', 'ix_video_thumbnail_digest')
+
+def video_youtube_id(conn):
+    _add_columns(conn, 'video', 'youtube_id')
+
+MIGRATIONS = [
+    (1, 'initial schema', initial_schema),
+    (2, 'leaderboard aggregate tables', leaderboard_aggregates),
+    (3, 'video and comment indexes', video_and_comment_indexes),
+    (4, 'job queue', job_queue),
+    (5, 'video updated_at', video_updated_at),
+    (6, 'video full-text search index', video_search_index),
+    (7, 'leader leases', leader_leases),
+    (8, 'video thumbnail digest', video_thumbnail_digest),
+    (9, 'video youtube id', video_youtube_id),
+]
+
+def _applied_versions(conn):
+    migration_metadata.create_all(conn, checkfirst=True)
+    return {row.version for row in conn.execute(select(schema_migrations.c.version))}
+
+def _pending(conn):
+    applied = set()
+    if inspect(conn).has_table('schema_migrations'):
+        applied = {row.version for row in conn.execute(select(schema_migrations.c.version))}
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
+
+async def pending_migrations(engine):
+    """(version, name) of every migration not applied yet, without changing the database."""
+    async with engine.connect() as conn:
+        return await conn.run_sync(_pending)
+
+async def run_migrations(engine):
+    """Apply pending migrations in order, one transaction each. Returns the versions applied."""
+    async with engine.begin() as conn:
+        applied = await conn.run_sync(_applied_versions)
+
+    newly_applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        async with engine.begin() as conn:
+            await conn.run_sync(migrate)
+            await conn.execute(schema_migrations.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+        newly_applied.append(version)
+    return newly_applied
@@ -0,0 +1,104 @@
+from datetime import datetime
+from flask_login import UserMixin
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
+
+# Shared by bot.py and web_interface.py so both processes agree on one schema.
+# Schema changes for existing databases go through migrations.py.
+Base = declarative_base()
+
+class User(UserMixin, Base):
+    __tablename__ = 'user'
+    id = Column(Integer, primary_key=True)
+    username = Column(String(80), unique=True, nullable=False)
+    password_hash = Column(String(120), nullable=False)  # see credentials.py
+
+class Video(Base):
+    __tablename__ = 'video'
+    id = Column(Integer, primary_key=True)
+    title = Column(String(100), nullable=False)
+    description = Column(Text, nullable=False)
+    maker = Column(String(100), nullable=False)
+    editor = Column(String(100))
+    thumbnail_maker = Column(String(100))
+    edited_path = Column(String(200))
+    thumbnail_path = Column(String(200))
+    thumbnail_digest = Column(String(64))  # see thumbnails.py
+    youtube_id = Column(String(20))
+    gdrive_link = Column(String(200), nullable=False)
+    status = Column(String(50), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __table_args__ = (
+        Index('ix_video_created_at', created_at),
+        Index('ix_video_maker_created_at', maker, created_at.desc()),
+        Index('ix_video_status_created_at', status, created_at),
+        Index('ix_video_thumbnail_digest', thumbnail_digest),
+    )
+
+class EditorRating(Base):
+    __tablename__ = 'editor_ratings'
+    editor_id = Column(String(100), primary_key=True)
+    rater_id = Column(String(100), primary_key=True)
+    rating = Column(Integer, nullable=False)
+
+class Comment(Base):
+    __tablename__ = 'comment'
+    id = Column(Integer, primary_key=True)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    user_id = Column(Integer, ForeignKey('user.id'), nullable=False)
+    video_id = Column(Integer, ForeignKey('video.id'), nullable=False)
+
+    user = relationship('User', backref='comments')
+    video = relationship('Video', backref='comments')
+    __table_args__ = (
+        Index('ix_comment_video_created_at', video_id, created_at),
+    )
+
+# Leaderboard aggregates, kept up to date in the same transaction as the writes
+# they summarise so leaderboard reads are indexed top-N lookups.
+class MakerStats(Base):
+    __tablename__ = 'maker_stats'
+    maker = Column(String(100), primary_key=True)
+    video_count = Column(Integer, nullable=False, default=0)
+    __table_args__ = (Index('ix_maker_stats_video_count', 'video_count'),)
+
+class EditorRatingStats(Base):
+    __tablename__ = 'editor_rating_stats'
+    editor_id = Column(String(100), primary_key=True)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_count = Column(Integer, nullable=False, default=0)
+    avg_rating = Column(Float, nullable=False, default=0)
+    __table_args__ = (Index('ix_editor_rating_stats_rank', 'avg_rating', 'rating_count'),)
+
+# One row per pipeline stage of a video, leased by workers (see jobs.py).
+class Job(Base):
+    __tablename__ = 'jobs'
+    id = Column(Integer, primary_key=True)
+    video_id = Column(Integer, ForeignKey('video.id', ondelete='CASCADE'), nullable=False)
+    stage = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default='queued')
+    priority = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    leased_by = Column(String(100))
+    lease_expires_at = Column(DateTime)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    duration = Column(Float)
+    __table_args__ = (
+        UniqueConstraint('video_id', 'stage', name='uq_jobs_video_stage'),
+        Index('ix_jobs_claim', 'status', 'priority', 'run_at'),
+    )
+
+# Named leases for work that must run in exactly one bot process (see leases.py).
+class Lease(Base):
+    __tablename__ = 'leases'
+    name = Column(String(100), primary_key=True)
+    holder = Column(String(100))
+    expires_at = Column(DateTime, nullable=False)
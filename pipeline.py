@@ -0,0 +1,56 @@
+import asyncio
+import json
+import os
+import shutil
+from downloader import download_file
+from thumbnails import ThumbnailError, prepare_thumbnail
+
+# Stage handlers for the video production pipeline run by jobs.JobWorkerPool.
+# The upload stage needs the bot's YouTube client and lives in bot.py.
+
+MEDIA_DIR = os.getenv('MEDIA_DIR', 'media')
+
+class StageError(Exception):
+    pass
+
+async def download_stage(video):
+    if video.edited_path and os.path.exists(video.edited_path):
+        return None
+    os.makedirs(MEDIA_DIR, exist_ok=True)
+    path = os.path.join(MEDIA_DIR, f"video_{video.id}.mp4")
+    await download_file(video.gdrive_link, path)
+    return {'edited_path': path}
+
+async def probe_media(path):
+    """Return ffprobe's stream list for path, or None when ffprobe is not installed."""
+    if shutil.which('ffprobe') is None:
+        return None
+    process = await asyncio.create_subprocess_exec(
+        'ffprobe', '-v', 'error', '-show_entries', 'stream=codec_type,codec_name', '-of', 'json', path,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise StageError(f"ffprobe could not read {path}: {stderr.decode().strip()}")
+    return json.loads(stdout).get('streams', [])
+
+async def transcode_check_stage(video):
+    if not video.edited_path or not os.path.exists(video.edited_path):
+        raise StageError(f"Edited file for video {video.id} is missing")
+    if os.path.getsize(video.edited_path) == 0:
+        raise StageError(f"Edited file for video {video.id} is empty")
+    streams = await probe_media(video.edited_path)
+    if streams is not None and not any(stream.get('codec_type') == 'video' for stream in streams):
+        raise StageError(f"Edited file for video {video.id} has no video stream")
+    return None
+
+async def thumbnail_stage(video):
+    if not video.thumbnail_path:
+        return None
+    if not os.path.exists(video.thumbnail_path):
+        raise StageError(f"Thumbnail for video {video.id} is missing: {video.thumbnail_path}")
+    try:
+        digest = await prepare_thumbnail(video.thumbnail_path)
+    except ThumbnailError as e:
+        raise StageError(f"Thumbnail for video {video.id} cannot be used: {e}")
+    return {'thumbnail_digest': digest}
@@ -0,0 +1,26 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+class LazyProcessPool:
+    """A ProcessPoolExecutor that starts on first use, so importing a module never forks.
+
+    shutdown() cancels queued work without waiting for running tasks; the next
+    get() starts a fresh pool.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,57 @@
+import re
+from sqlalchemy import DateTime, text
+
+# Ranked full-text search over video titles and descriptions. SQLite uses the
+# video_fts FTS5 table and Postgres the video.search_vector GIN index, both
+# created by migrations.py and kept in sync by the database itself.
+
+MAX_TERMS = 8
+MAX_RESULTS = 1000
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+def _match_expression(dialect_name, terms):
+    # Every term must match; the last one also matches as a prefix, so results
+    # keep up while someone is still typing.
+    if dialect_name == 'postgresql':
+        return ' & '.join(terms[:-1] + [f"{terms[-1]}:*"])
+    return ' '.join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+# Scoring every match of a very common term costs time proportional to the
+# whole table, so only the newest RANK_CANDIDATES matches are ranked. Finding
+# them is cheap: both indexes return matches in id order.
+RANK_CANDIDATES = 2000
+
+SQLITE_SEARCH = text(
+    "SELECT video.id, video.title, video.description, video.status, video.maker, video.created_at, video.thumbnail_digest "
+    "FROM video_fts JOIN video ON video.id = video_fts.rowid "
+    "WHERE video_fts MATCH :match AND video_fts.rowid >= coalesce(("
+    "SELECT rowid FROM video_fts WHERE video_fts MATCH :match ORDER BY rowid DESC LIMIT 1 OFFSET :candidates - 1"
+    "), 0) "
+    "ORDER BY video_fts.rank, video.id LIMIT :limit OFFSET :offset"
+).columns(created_at=DateTime)
+
+POSTGRES_SEARCH = text(
+    "SELECT id, title, description, status, maker, created_at, thumbnail_digest "
+    "FROM video, to_tsquery('english', :match) AS query "
+    "WHERE id IN ("
+    "SELECT id FROM video WHERE search_vector @@ to_tsquery('english', :match) ORDER BY id DESC LIMIT :candidates"
+    ") "
+    "ORDER BY ts_rank(search_vector, query) DESC, id LIMIT :limit OFFSET :offset"
+).columns(created_at=DateTime)
+
+async def search_videos(session, query, limit=20, offset=0):
+    """Return (rows, has_more) for the best matches of query, most relevant first."""
+    terms = search_terms(query)
+    if not terms or offset >= MAX_RESULTS:
+        return [], False
+    limit = min(limit, MAX_RESULTS - offset)
+    dialect_name = session.bind.dialect.name
+    statement = POSTGRES_SEARCH if dialect_name == 'postgresql' else SQLITE_SEARCH
+    result = await session.execute(statement, {
+        'match': _match_expression(dialect_name, terms), 'candidates': RANK_CANDIDATES,
+        'limit': limit + 1, 'offset': offset
+    })
+    rows = result.all()
+    return rows[:limit], len(rows) > limit and offset + limit < MAX_RESULTS
@@ -0,0 +1,121 @@
+import functools
+import os
+import time
+import uuid
+from collections import OrderedDict
+from cachelib import FileSystemCache, NullCache, RedisCache
+
+# Page cache shared by every web worker, with tag-based invalidation.
+#
+# Entries live in a small in-process LRU in front of an optional shared backend
+# (a cache directory or a local Redis). Every entry remembers the version of
+# each tag it depends on; invalidate() gives a tag a new version in the shared
+# backend, which makes all dependent entries in every process stale at once.
+# The bot and the web app both call invalidate() after their writes.
+
+TAG_VIDEOS = 'videos'
+
+def make_shared_backend():
+    backend = os.getenv('CACHE_BACKEND', 'filesystem')
+    if backend == 'filesystem':
+        return FileSystemCache(os.getenv('CACHE_DIR', 'cache'), threshold=int(os.getenv('CACHE_THRESHOLD', 2000)))
+    if backend == 'redis':
+        import redis  # Optional dependency, only needed for this backend.
+        client = redis.Redis.from_url(os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+        return RedisCache(client, key_prefix='video-manager:')
+    if backend == 'memory':
+        return None
+    return NullCache()
+
+class TaggedCache:
+    def __init__(self, shared=None, local_size=256, default_timeout=300):
+        self.shared = shared
+        self.local_size = local_size
+        self.default_timeout = default_timeout
+        self._local = OrderedDict()
+        self._local_tags = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _tag_versions(self, tags):
+        if self.shared is None:
+            return tuple(self._local_tags.setdefault(tag, uuid.uuid4().hex) for tag in tags)
+        keys = [f"tag:{tag}" for tag in tags]
+        versions = list(self.shared.get_many(*keys))
+        for i, version in enumerate(versions):
+            if version is None:
+                # Unknown (or evicted) tag: start a fresh version so nothing cached
+                # against an older one can match.
+                self.shared.add(keys[i], uuid.uuid4().hex, timeout=0)
+                versions[i] = self.shared.get(keys[i])
+        return tuple(versions)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            version = uuid.uuid4().hex
+            if self.shared is None:
+                self._local_tags[tag] = version
+            else:
+                self.shared.set(f"tag:{tag}", version, timeout=0)
+
+    def get(self, key, tags=()):
+        versions = self._tag_versions(tags)
+        entry = self._local.get(key)
+        if entry is not None:
+            value, expires_at, entry_versions = entry
+            if expires_at > time.time() and entry_versions == versions:
+                self._local.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._local[key]
+        if self.shared is not None:
+            entry = self.shared.get(key)
+            if entry is not None:
+                value, expires_at, entry_versions = entry
+                if expires_at > time.time() and tuple(entry_versions) == versions:
+                    self._store_local(key, (value, expires_at, versions))
+                    self.hits += 1
+                    return value
+        self.misses += 1
+        return None
+
+    def set(self, key, value, tags=(), timeout=None):
+        timeout = timeout or self.default_timeout
+        entry = (value, time.time() + timeout, self._tag_versions(tags))
+        self._store_local(key, entry)
+        if self.shared is not None:
+            self.shared.set(key, entry, timeout=timeout)
+
+    def _store_local(self, key, entry):
+        self._local[key] = entry
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    def cached(self, tags, timeout=None, vary=None):
+        """Cache a Flask view's rendered output, keyed by its full path.
+
+        vary returns extra key material (e.g. the logged-in user, who is shown
+        in the navigation bar). Only string responses are cached, and never a
+        page rendered with pending flash messages.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            async def wrapper(*args, **kwargs):
+                from flask import request, session
+                if session.get('_flashes'):
+                    return await view(*args, **kwargs)
+                key = f"view:{request.full_path}"
+                if vary is not None:
+                    key = f"{key}|{vary()}"
+                value = self.get(key, tags)
+                if value is not None:
+                    return value
+                value = await view(*args, **kwargs)
+                if isinstance(value, str):
+                    self.set(key, value, tags, timeout)
+                return value
+            return wrapper
+        return decorator
+
+page_cache = TaggedCache(make_shared_backend())
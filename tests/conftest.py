@@ -0,0 +1,40 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+# The bot and web modules read their settings at import, so point them at a
+# scratch database and config before any test imports them.
+WORKDIR = tempfile.mkdtemp(prefix='tests-')
+with open(os.path.join(WORKDIR, 'config.json'), 'w') as f:
+    json.dump({key: '1' for key in (
+        'editor_channel_id', 'thumbnail_channel_id', 'github_issues_channel_id', 'support_channel_id',
+        'trusted_role_id', 'github_token', 'github_username', 'youtube_token_path'
+    )}, f)
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(WORKDIR, 'videos.db')}",
+    'CONFIG_PATH': os.path.join(WORKDIR, 'config.json'),
+    'CACHE_BACKEND': 'memory',
+    'METRICS_PORT': '',
+    'JOB_WORKERS': '0',
+    'HASH_WORKERS': '0',
+    'BCRYPT_ROUNDS': '4',
+    'THUMBNAIL_DIR': os.path.join(WORKDIR, 'thumbnails'),
+})
+
+def _migrate():
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from migrations import run_migrations
+    engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(WORKDIR, 'videos.db')}")
+
+    async def migrate():
+        await run_migrations(engine)
+        await engine.dispose()
+    asyncio.run(migrate())
+
+_migrate()
@@ -0,0 +1,30 @@
+import asyncio
+import discord
+import harness
+from dispatcher import MessageDispatcher
+from metrics import REGISTRY
+
+class FakeBot:
+    def __init__(self):
+        self.channel = harness.FakeChannel(1)
+
+    def get_channel(self, channel_id):
+        return self.channel
+
+def test_sends_are_batched_and_timed():
+    bot = FakeBot()
+
+    async def main():
+        dispatcher = MessageDispatcher(bot)
+        try:
+            futures = [dispatcher.send_embed(1, discord.Embed(title=f"Embed {n}")) for n in range(3)]
+            await asyncio.gather(*futures)
+            return dispatcher.queue_depth()
+        finally:
+            await dispatcher.close()
+
+    assert asyncio.run(main()) == 0
+    assert bot.channel.messages == 1
+    rendered = REGISTRY.render()
+    assert 'discord_send_duration_seconds_count{status="ok"}' in rendered
+    assert 'discord_queue_wait_seconds_count' in rendered
@@ -0,0 +1,117 @@
+import asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from github_watcher import GitHubIssueWatcher
+
+def issue(number, pull_request=False):
+    issue = {'number': number, 'title': f"Issue {number}", 'html_url': f"https://example.com/{number}",
+             'created_at': f"2024-01-{number:02d}T00:00:00Z"}
+    if pull_request:
+        issue['pull_request'] = {}
+    return issue
+
+class StubGitHub:
+    """Serves /users/alice/repos and /repos/alice/app/issues with ETags, recording each request."""
+
+    def __init__(self):
+        self.issues = [issue(2), issue(1)]
+        self.version = 1
+        self.requests = []
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_get('/users/alice/repos', self.repos)
+        app.router.add_get('/repos/alice/app/issues', self.issue_list)
+        return app
+
+    def _reply(self, request, etag, body):
+        self.requests.append((request.path, dict(request.query), request.headers.get('If-None-Match')))
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304)
+        return web.json_response(body, headers={'ETag': etag})
+
+    async def repos(self, request):
+        return self._reply(request, '"repos"', [{'full_name': 'alice/app'}])
+
+    async def issue_list(self, request):
+        return self._reply(request, f'"issues-{self.version}"', self.issues)
+
+def poll_rounds(tmp_path, github, rounds):
+    """Poll the stub once per round, calling each round's setup first; returns the issue numbers reported per round."""
+    async def main():
+        server = TestServer(github.make_app())
+        await server.start_server()
+        try:
+            watcher = GitHubIssueWatcher('token', 'alice', state_path=str(tmp_path / 'state.json'),
+                                         api_url=str(server.make_url('')))
+            reported = []
+            for setup in rounds:
+                setup()
+                found = []
+                async def on_new_issue(repo_name, issue):
+                    found.append(issue['number'])
+                await watcher.poll(on_new_issue)
+                reported.append(found)
+            return watcher, reported
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+def test_first_seen_repository_is_recorded_not_reported(tmp_path):
+    github = StubGitHub()
+    watcher, reported = poll_rounds(tmp_path, github, [lambda: None])
+    assert reported == [[]]
+    assert watcher.state['repos']['alice/app'] == {
+        'last_number': 2, 'since': '2024-01-02T00:00:00Z', 'etag': '"issues-1"'
+    }
+
+def test_unchanged_repository_is_a_304(tmp_path):
+    github = StubGitHub()
+    _, reported = poll_rounds(tmp_path, github, [lambda: None, lambda: None])
+    assert reported == [[], []]
+    assert github.requests[-2:] == [
+        ('/users/alice/repos', {'per_page': '100'}, '"repos"'),
+        ('/repos/alice/app/issues', {'state': 'open', 'sort': 'created', 'direction': 'desc', 'per_page': '100',
+                                     'since': '2024-01-02T00:00:00Z'}, '"issues-1"'),
+    ]
+
+def test_only_issues_above_the_high_water_mark_are_reported(tmp_path):
+    github = StubGitHub()
+
+    def open_more():
+        github.issues = [issue(5, pull_request=True), issue(4), issue(3)] + github.issues
+        github.version = 2
+
+    watcher, reported = poll_rounds(tmp_path, github, [lambda: None, open_more, lambda: None])
+    # The pull request is not reported but still moves the high-water mark.
+    assert reported == [[], [3, 4], []]
+    assert watcher.state['repos']['alice/app']['last_number'] == 5
+
+def test_state_survives_a_restart(tmp_path):
+    github = StubGitHub()
+    poll_rounds(tmp_path, github, [lambda: None])
+
+    def open_one():
+        github.issues = [issue(3)] + github.issues
+        github.version = 2
+
+    _, reported = poll_rounds(tmp_path, github, [open_one])
+    assert reported == [[3]]
+
+def test_run_keeps_going_after_an_unexpected_error(tmp_path, capsys):
+    watcher = GitHubIssueWatcher('token', 'alice', state_path=str(tmp_path / 'state.json'))
+    calls = []
+
+    async def poll(on_new_issue):
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise ValueError("unexpected payload")
+        raise asyncio.CancelledError()
+
+    watcher.poll = poll
+    try:
+        asyncio.run(watcher.run(None, interval=0))
+    except asyncio.CancelledError:
+        pass
+    assert calls == [0, 1]
+    assert "unexpected payload" in capsys.readouterr().out
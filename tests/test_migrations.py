@@ -0,0 +1,47 @@
+import asyncio
+import os
+import shutil
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import create_async_engine
+from conftest import ROOT
+from migrations import MIGRATIONS, pending_migrations, run_migrations
+
+BASELINE = os.path.join(ROOT, 'instance', 'videos.db')
+
+def migrate(path):
+    """Migrate the SQLite database at path; returns (versions applied, {table: (columns, indexes)})."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+    def describe(conn):
+        inspector = inspect(conn)
+        return {
+            table: ({column['name'] for column in inspector.get_columns(table)},
+                    {index['name'] for index in inspector.get_indexes(table)})
+            for table in inspector.get_table_names()
+        }
+
+    async def main():
+        try:
+            applied = await run_migrations(engine)
+            assert await pending_migrations(engine) == []
+            async with engine.connect() as conn:
+                return applied, await conn.run_sync(describe)
+        finally:
+            await engine.dispose()
+    return asyncio.run(main())
+
+def test_baseline_database_upgrades_to_the_current_schema(tmp_path):
+    upgraded = tmp_path / 'baseline.db'
+    shutil.copy(BASELINE, upgraded)
+    applied, schema = migrate(upgraded)
+    assert applied == [version for version, _, _ in MIGRATIONS]
+
+    _, fresh = migrate(tmp_path / 'fresh.db')
+    assert schema == fresh
+    assert 'ix_video_thumbnail_digest' in schema['video'][1]
+
+def test_migrations_are_idempotent(tmp_path):
+    shutil.copy(BASELINE, tmp_path / 'baseline.db')
+    migrate(tmp_path / 'baseline.db')
+    applied, _ = migrate(tmp_path / 'baseline.db')
+    assert applied == []
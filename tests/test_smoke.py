@@ -0,0 +1,84 @@
+import asyncio
+import harness
+
+def test_bot_submit_video_then_status():
+    import bot
+    harness.install_fake_client(bot.bot)
+    commands = {command.name: command for command in bot.bot.tree.get_commands()}
+    maker = harness.FakeUser(harness.maker_id(1))
+
+    async def main():
+        try:
+            first = harness.FakeInteraction(maker)
+            await commands['submit_video'].callback(first)
+            modal = first.response.modal
+            modal.video_title._value = "Smoke test video"
+            modal.description._value = "Submitted from the test suite"
+            modal.gdrive_link._value = "https://drive.google.com/file/d/smoke"
+            await modal.on_submit(harness.FakeInteraction(maker))
+
+            status = harness.FakeInteraction(maker)
+            await commands['video_status'].callback(status)
+            return status.response.sent
+        finally:
+            await bot.shutdown()
+
+    sent = asyncio.run(main())
+    embed = sent[-1][1]['embed']
+    assert [field.name for field in embed.fields] == ["Smoke test video"]
+    assert embed.fields[0].value == "Status: Submitted"
+
+def test_web_routes():
+    import web_interface
+    from database import add_video, close_db, ensure_admin_user
+
+    async def seed():
+        try:
+            await add_video(title="Web smoke video", description="d", maker=harness.maker_id(2),
+                            gdrive_link="https://drive.google.com/file/d/web", status='submitted')
+            await ensure_admin_user('admin-password')
+        finally:
+            await close_db()
+    asyncio.run(seed())
+
+    web_interface.app.config['WTF_CSRF_ENABLED'] = False
+    client = web_interface.app.test_client()
+
+    assert b"Web smoke video" in client.get('/').data
+    videos = client.get('/api/videos?limit=50').get_json()['videos']
+    assert "Web smoke video" in [video['title'] for video in videos]
+
+    assert client.get('/metrics').status_code == 200
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '192.0.2.1'}).status_code == 403
+    assert client.get('/config').status_code == 302
+
+    response = client.post('/login', data={'username': 'admin', 'password': 'admin-password'})
+    assert response.status_code == 302
+    assert client.get('/config').status_code == 200
+
+def test_ndjson_export_with_thumbnails():
+    import json
+    import web_interface
+    from database import add_video, close_db
+    digest = 'ab' * 32
+
+    async def seed():
+        try:
+            await add_video(title="Export smoke video", description="d", maker=harness.maker_id(3),
+                            gdrive_link="https://drive.google.com/file/d/export", status='submitted',
+                            thumbnail_digest=digest)
+        finally:
+            await close_db()
+    asyncio.run(seed())
+
+    client = web_interface.app.test_client()
+    response = client.get(f"/api/videos?format=ndjson&maker={harness.maker_id(3)}")
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['thumbnail_url'] for row in rows] == [f"/thumbnails/{digest}/small.jpg"]
+
+    assert client.get('/api/videos?format=ndjson&limit=1').get_data(as_text=True).count('\n') == 1
+    for limit in ('0', '-1', 'many'):
+        assert client.get(f"/api/videos?format=ndjson&limit={limit}").status_code == 400
+
+    videos = client.get(f"/api/videos?maker={harness.maker_id(3)}").get_json()['videos']
+    assert [video['thumbnail_url'] for video in videos] == [f"/thumbnails/{digest}/small.jpg"]
@@ -0,0 +1,39 @@
+import os
+from PIL import Image
+import thumbnails
+
+def make_sources(directory, count):
+    paths = []
+    for n in range(count):
+        path = os.path.join(directory, f"source-{n}.png")
+        Image.effect_noise((160, 90), 40 + n).convert('RGB').resize((1280, 720)).save(path)
+        paths.append(path)
+    return paths
+
+def cache_bytes(cache_dir):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(cache_dir) for name in names)
+
+def test_cache_stays_under_its_cap_without_rescanning_every_render(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    sources = make_sources(str(tmp_path), 12)
+    scans = []
+    scan = thumbnails._scan
+    monkeypatch.setattr(thumbnails, '_scan', lambda directory: scans.append(directory) or scan(directory))
+    monkeypatch.setattr(thumbnails, '_cache_sizes', {})
+    monkeypatch.setattr(thumbnails, 'EVICT_TO', 0.5)
+
+    first = thumbnails.render_thumbnails(sources[0], cache_dir, 10 ** 9)
+    per_image = cache_bytes(cache_dir)
+    max_bytes = per_image * 4
+    scans.clear()
+    for path in sources[1:]:
+        thumbnails.render_thumbnails(path, cache_dir, max_bytes)
+        assert cache_bytes(cache_dir) <= max_bytes + per_image
+    # Listed only to evict, about every other image here rather than on every render.
+    assert 0 < len(scans) <= (len(sources) - 1) // 2 + 1, scans
+
+    # A cached digest is served without re-rendering or listing the directory.
+    scans.clear()
+    last = thumbnails.render_thumbnails(sources[-1], cache_dir, max_bytes)
+    assert scans == [] and thumbnails.cached_variant(last, 'youtube', cache_dir)
+    assert first != last
@@ -0,0 +1,110 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httplib2
+import pytest
+from googleapiclient.discovery import build
+from youtube_upload import CHUNK_GRANULARITY, UploadSessionStore, upload_video
+
+class FakeResumableEndpoint(BaseHTTPRequestHandler):
+    """Just enough of YouTube's resumable upload protocol: start a session, take chunks, report progress."""
+
+    sessions = {}
+    chunks = []
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=None, headers=()):
+        data = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        session = f"/session/{len(self.sessions) + 1}"
+        self.sessions[session] = bytearray()
+        self._reply(200, headers=[('Location', f"http://127.0.0.1:{self.server.server_port}{session}")])
+
+    def do_PUT(self):
+        received = self.sessions.get(self.path)
+        if received is None:
+            return self._reply(404)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        match = re.match(r'bytes (\d+)-(\d+)/(\d+)', self.headers['Content-Range'])
+        total = int(self.headers['Content-Range'].split('/')[1])
+        if match:
+            assert int(match.group(1)) == len(received), "chunk does not continue where the session stopped"
+            received += body
+            self.chunks.append((self.path, len(body)))
+        if len(received) == total:
+            return self._reply(200, {'id': 'fake-video-id'})
+        self._reply(308, headers=[('Range', f"bytes=0-{len(received) - 1}")] if received else [])
+
+class PlainHttp(httplib2.Http):
+    # The client builds upload URLs with https; the fake endpoint speaks plain HTTP.
+    # 308 means "resume incomplete" here, not a redirect, as in googleapiclient's build_http().
+    def __init__(self):
+        super().__init__()
+        self.redirect_codes = self.redirect_codes - {308}
+
+    def request(self, uri, *args, **kwargs):
+        return super().request(uri.replace('https://', 'http://', 1), *args, **kwargs)
+
+@pytest.fixture
+def endpoint():
+    FakeResumableEndpoint.sessions = {}
+    FakeResumableEndpoint.chunks = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeResumableEndpoint)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def youtube(endpoint):
+    return build('youtube', 'v3', http=PlainHttp(), static_discovery=True, client_options={'api_endpoint': endpoint})
+
+class Crash(Exception):
+    pass
+
+def test_upload_resumes_after_a_crash(youtube, tmp_path):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(b'x' * (CHUNK_GRANULARITY * 2 + 1000))
+    store = UploadSessionStore(str(tmp_path / 'sessions.json'))
+
+    def crash(stats):
+        raise Crash()
+
+    with pytest.raises(Crash):
+        upload_video(youtube, 7, str(path), {}, chunk_size=CHUNK_GRANULARITY, store=store, on_progress=crash)
+    assert FakeResumableEndpoint.chunks == [('/session/1', CHUNK_GRANULARITY)]
+
+    video_id, stats = upload_video(youtube, 7, str(path), {}, chunk_size=CHUNK_GRANULARITY, store=store)
+    assert video_id == 'fake-video-id'
+    assert stats.resumed_from == CHUNK_GRANULARITY
+    # The first chunk was not sent again, and no second session was started.
+    assert FakeResumableEndpoint.chunks == [
+        ('/session/1', CHUNK_GRANULARITY), ('/session/1', CHUNK_GRANULARITY), ('/session/1', 1000)
+    ]
+
+    # A finished upload is remembered until the caller has recorded its id.
+    video_id, _ = upload_video(youtube, 7, str(path), {}, chunk_size=CHUNK_GRANULARITY, store=store)
+    assert video_id == 'fake-video-id'
+    assert len(FakeResumableEndpoint.chunks) == 3
+
+def test_expired_session_starts_over(youtube, endpoint, tmp_path):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(b'x' * 1000)
+    store = UploadSessionStore(str(tmp_path / 'sessions.json'))
+    store.put(7, {'uri': f"{endpoint}/session/expired", 'path': str(path), 'size': 1000})
+
+    video_id, stats = upload_video(youtube, 7, str(path), {}, chunk_size=CHUNK_GRANULARITY, store=store)
+    assert video_id == 'fake-video-id'
+    assert stats.resumed_from == 0
+    assert FakeResumableEndpoint.chunks == [('/session/1', 1000)]
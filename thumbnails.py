@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+from PIL import Image, ImageOps
+from pools import LazyProcessPool
+
+# Thumbnails are checked and resized in worker processes, never in a web request
+# or on the bot's event loop. Each source image is cached under the digest of its
+# bytes, as an upload-ready rendition for YouTube and smaller JPEGs for the web UI:
+#
+#   THUMBNAIL_DIR/ab/ab12...ef-youtube.jpg
+#
+# A digest always names the same pixels, so the web UI serves them as immutable.
+# Once the cache grows past THUMBNAIL_CACHE_MB the least recently used files are
+# deleted, down to 90% of it; they are rebuilt from Video.thumbnail_path the next
+# time they are needed. Each worker keeps a running estimate of the cache size and
+# only lists the directory to refresh it every RESCAN_SECONDS or to evict.
+
+THUMBNAIL_DIR = os.getenv('THUMBNAIL_DIR', 'thumbnails')
+THUMBNAIL_CACHE_MB = int(os.getenv('THUMBNAIL_CACHE_MB', 1024))
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+
+# YouTube takes thumbnails of up to 2 MB, at least 640 pixels wide, and shows them at 16:9.
+YOUTUBE_MAX_BYTES = 2 * 1024 * 1024
+MIN_WIDTH = 640
+MAX_PIXELS = 40_000_000
+VARIANTS = {
+    # name: (size, JPEG quality)
+    'youtube': ((1280, 720), 90),
+    'large': ((640, 360), 80),
+    'small': ((320, 180), 70),
+}
+WEB_VARIANTS = ('large', 'small')
+VERSION = b'1'  # Part of every digest; bump it when the renditions change.
+DIGEST = re.compile(r'[0-9a-f]{64}')
+RESCAN_SECONDS = 60
+EVICT_TO = 0.9
+
+thumbnail_pool = LazyProcessPool(THUMBNAIL_WORKERS)
+_cache_sizes = {}  # In each worker: cache_dir -> (estimated bytes, when it was last counted)
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+class ThumbnailError(Exception):
+    pass
+
+def variant_path(digest, variant, cache_dir=THUMBNAIL_DIR):
+    return os.path.join(cache_dir, digest[:2], f"{digest}-{variant}.jpg")
+
+def cached_variant(digest, variant, cache_dir=THUMBNAIL_DIR):
+    """Path of a cached rendition, or None if it has not been made or was evicted."""
+    path = variant_path(digest, variant, cache_dir)
+    try:
+        # Eviction goes by mtime; refresh it at most hourly rather than on every hit.
+        if os.stat(path).st_mtime < time.time() - 3600:
+            os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+def _to_rgb(image):
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+def _fit(image, size):
+    # Near-16:9 images are cropped to fill the frame; others are letterboxed
+    # rather than losing a large part of the picture.
+    if abs(image.width / image.height - size[0] / size[1]) <= 0.1 * size[0] / size[1]:
+        return ImageOps.fit(image, size, Image.LANCZOS)
+    return ImageOps.pad(image, size, Image.LANCZOS, color=(0, 0, 0))
+
+def _encode_jpeg(image, quality, max_bytes=None):
+    while True:
+        buf = io.BytesIO()
+        image.save(buf, 'JPEG', quality=quality, optimize=True, progressive=True)
+        if max_bytes is None or buf.tell() <= max_bytes or quality <= 40:
+            break
+        quality -= 10
+    if max_bytes is not None and buf.tell() > max_bytes:
+        raise ThumbnailError(f"Could not compress the thumbnail below {max_bytes} bytes")
+    return buf.getvalue()
+
+def _write_atomically(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _scan(cache_dir):
+    files = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_dir():
+            for file in os.scandir(entry.path):
+                try:
+                    stat = file.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, file.path))
+    return files
+
+def _evict(cache_dir, max_bytes, keep):
+    """Delete the least recently used files until the cache fits in max_bytes. Returns its new size."""
+    files = _scan(cache_dir)
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if os.path.basename(path).startswith(keep):
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # Evicted by another worker.
+        total -= size
+    return total
+
+def _account(cache_dir, max_bytes, written, keep):
+    size, counted_at = _cache_sizes.get(cache_dir, (None, 0.0))
+    if size is None or time.monotonic() - counted_at > RESCAN_SECONDS:
+        # Other workers write to the same directory, so recount now and then.
+        size, counted_at = sum(entry[1] for entry in _scan(cache_dir)), time.monotonic()
+    else:
+        size += written
+    if size > max_bytes:
+        size, counted_at = _evict(cache_dir, int(max_bytes * EVICT_TO), keep), time.monotonic()
+    _cache_sizes[cache_dir] = (size, counted_at)
+
+def render_thumbnails(source_path, cache_dir, max_bytes):
+    """Runs in a worker process. Caches every rendition of source_path and returns its digest."""
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+
+    with open(source_path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(VERSION + data).hexdigest()
+    if all(cached_variant(digest, variant, cache_dir) for variant in VARIANTS):
+        return digest
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception as e:
+        raise ThumbnailError(f"{source_path} is not a readable image: {e}")
+    image = _to_rgb(ImageOps.exif_transpose(image))
+    if image.width < MIN_WIDTH:
+        raise ThumbnailError(f"{source_path} is {image.width}x{image.height}; YouTube needs at least {MIN_WIDTH} pixels wide")
+
+    written = 0
+    for variant, (size, quality) in VARIANTS.items():
+        max_size = YOUTUBE_MAX_BYTES if variant == 'youtube' else None
+        data = _encode_jpeg(_fit(image, size), quality, max_size)
+        _write_atomically(variant_path(digest, variant, cache_dir), data)
+        written += len(data)
+    _account(cache_dir, max_bytes, written, keep=digest)
+    return digest
+
+async def prepare_thumbnail(source_path):
+    """Validate source_path and cache its renditions in the worker pool. Returns its digest.
+
+    Raises ThumbnailError if the image cannot be used.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        thumbnail_pool.get(), render_thumbnails, source_path, THUMBNAIL_DIR, THUMBNAIL_CACHE_MB * 1024 * 1024
+    )
+
+async def youtube_thumbnail(source_path):
+    """Path of the upload-ready rendition of source_path, rebuilt if it was evicted."""
+    return variant_path(await prepare_thumbnail(source_path), 'youtube')
+
+def refresh_in_background(digest, source_path):
+    """Rebuild an evicted digest in the worker pool without waiting for it."""
+    with _refreshing_lock:
+        if digest in _refreshing or not os.path.exists(source_path):
+            return
+        _refreshing.add(digest)
+    future = thumbnail_pool.get().submit(
+        render_thumbnails, source_path, THUMBNAIL_DIR, THUMBNAIL_CACHE_MB * 1024 * 1024
+    )
+    future.add_done_callback(lambda _: _refreshing.discard(digest))
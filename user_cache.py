@@ -0,0 +1,94 @@
+import asyncio
+import time
+from collections import OrderedDict
+import discord
+
+class UserCache:
+    """Resolves Discord user ids to users, caching results with TTL and LRU eviction."""
+
+    def __init__(self, bot, ttl=3600, max_size=5000):
+        self.bot = bot
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._pending = {}
+
+    def _get_cached(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return user
+
+    def _store(self, user_id, user):
+        self._entries[user_id] = (user, time.monotonic() + self.ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _from_gateway_cache(self, user_id):
+        user = self.bot.get_user(user_id)
+        if user is not None:
+            return user
+        for guild in self.bot.guilds:
+            member = guild.get_member(user_id)
+            if member is not None:
+                return member
+        return None
+
+    async def _fetch(self, user_id):
+        try:
+            user = await self.bot.fetch_user(user_id)
+        except (discord.NotFound, discord.HTTPException):
+            user = None
+        if user is not None:
+            self._store(user_id, user)
+        return user
+
+    async def resolve_many(self, user_ids):
+        """Return a dict mapping each id to a user, or None if it could not be resolved."""
+        resolved = {}
+        misses = []
+        for user_id in dict.fromkeys(int(i) for i in user_ids):
+            user = self._get_cached(user_id) or self._from_gateway_cache(user_id)
+            if user is not None:
+                self._store(user_id, user)
+                resolved[user_id] = user
+            else:
+                misses.append(user_id)
+
+        # Concurrent REST lookups for the misses; identical in-flight lookups are shared.
+        tasks = []
+        for user_id in misses:
+            task = self._pending.get(user_id)
+            if task is None:
+                task = asyncio.ensure_future(self._fetch(user_id))
+                self._pending[user_id] = task
+                task.add_done_callback(lambda _, uid=user_id: self._pending.pop(uid, None))
+            tasks.append(task)
+        for user_id, user in zip(misses, await asyncio.gather(*tasks)):
+            resolved[user_id] = user
+        return resolved
+
+    async def resolve(self, user_id):
+        return (await self.resolve_many([user_id]))[int(user_id)]
+
+    async def names(self, user_ids, default='Unknown user'):
+        """Return a dict mapping each stored id string to a display name.
+
+        Ids that are not Discord snowflakes (e.g. web usernames) map to themselves.
+        """
+        user_ids = [str(i) for i in user_ids]
+        users = await self.resolve_many(i for i in user_ids if i.isdigit())
+        names = {}
+        for user_id in user_ids:
+            if not user_id.isdigit():
+                names[user_id] = user_id
+            else:
+                user = users[int(user_id)]
+                names[user_id] = user.name if user else default
+        return names
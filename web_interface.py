@@ -1,107 +1,175 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-from flask_sqlalchemy import SQLAlchemy
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, jsonify, make_response, g, send_file
+import asyncio
+import functools
+import hashlib
+import ipaddress
 import json
 import os
-from datetime import datetime
+import threading
+import time
+from datetime import date, datetime, timezone
 from flask_bootstrap import Bootstrap
 from flask_wtf import FlaskForm
 from wtforms import StringField, TextAreaField, SubmitField, PasswordField
-from wtforms.validators import DataRequired, URL, EqualTo
-from flask_caching import Cache
-import matplotlib.pyplot as plt
-import io
-import base64
+from wtforms.validators import DataRequired, Optional, URL, EqualTo
 from flask_paginate import Pagination, get_page_args
 from flask_wtf.csrf import CSRFProtect
-from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-import plotly.express as px
-import pandas as pd
+from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from flask import abort
-import threading
 from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.future import select
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy import delete, func, update
+from models import User, Video, Comment, Job, MakerStats
+from config_store import config_store
+from tagged_cache import TAG_VIDEOS, page_cache
+from analytics import BUCKETS, submission_counts, status_counts
+from search import search_videos
+from metrics import CONTENT_TYPE, REGISTRY, instrument_engine, monitor_event_loop, observe_request, profiler
+from loop_thread import EventLoopThread
+from db_profiles import make_async_engine, make_sync_engine
+from credentials import CredentialServiceBusy, SessionCache, hash_password, hash_pool, needs_rehash, verify_password
+from thumbnails import DIGEST, WEB_VARIANTS, cached_variant, refresh_in_background, thumbnail_pool
+from database import (
+    async_database_url, sync_database_url, record_video_added, record_video_removed,
+    decode_video_cursor, encode_video_cursor, video_listing_query, get_video_with_comment_stats,
+    get_comment_page
+)
 
 load_dotenv()  # Load environment variables from .env file
 
-app = Flask(__name__)
+# How async views run under the WSGI server:
+#   shared       every view runs on one long-lived event loop, so the async
+#                engine's connection pool is shared by all requests (default)
+#   per-request  Flask's default: a new event loop for each request, and no
+#                pooling, since a connection cannot outlive its loop
+#   sync         per-request loops, but the busiest pages (/, /leaderboard and
+#                /api/videos) read through the pooled blocking engine instead
+WEB_EVENT_LOOP = os.getenv('WEB_EVENT_LOOP', 'shared')
+if WEB_EVENT_LOOP not in ('shared', 'per-request', 'sync'):
+    raise ValueError(f"WEB_EVENT_LOOP must be 'shared', 'per-request' or 'sync', not {WEB_EVENT_LOOP!r}")
+
+async def stop_web_loop():
+    hash_pool.shutdown()
+    thumbnail_pool.shutdown()
+    await engine.dispose()
+
+web_loop = EventLoopThread('web-event-loop', on_start=lambda: monitor_event_loop('web'), on_stop=stop_web_loop)
+
+class VideoManagerFlask(Flask):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._engine_ready = False
+        self._engine_ready_lock = threading.Lock()
+
+    def async_to_sync(self, func):
+        if WEB_EVENT_LOOP == 'shared':
+            @functools.wraps(func)
+            def run(*args, **kwargs):
+                return web_loop.run(func(*args, **kwargs))
+            return run
+        # SQLAlchemy guards an engine's first connection with an asyncio lock
+        # bound to the loop that makes it, which deadlocks concurrent requests
+        # on other loops. Make that connection once, before any of them.
+        if not self._engine_ready:
+            with self._engine_ready_lock:
+                if not self._engine_ready:
+                    asyncio.run(connect_once())
+                    self._engine_ready = True
+        return super().async_to_sync(func)
+
+app = VideoManagerFlask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', os.urandom(24))
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite+aiosqlite:///videos.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
 Bootstrap(app)
-cache = Cache(app, config={'CACHE_TYPE': 'simple'})
 csrf = CSRFProtect(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
+config_store.start_watching()
 
 # Asynchronous database setup
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite+aiosqlite:///videos.db')
-engine = create_async_engine(DATABASE_URL, echo=True)
+DATABASE_URL = async_database_url(os.getenv('DATABASE_URL', 'sqlite+aiosqlite:///videos.db'))
+# A pooled connection is tied to the event loop that opened it.
+engine = make_async_engine(DATABASE_URL, pooled=WEB_EVENT_LOOP == 'shared')
 async_session = sessionmaker(
     bind=engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
-Base = declarative_base()
+sync_engine = make_sync_engine(sync_database_url(DATABASE_URL))
+sync_session = sessionmaker(bind=sync_engine)
+
+async def connect_once():
+    async with engine.connect():
+        pass
+
+async def read(func, *args):
+    """Return func(session, *args), run with a blocking Session.
+
+    With WEB_EVENT_LOOP=sync it uses the pooled blocking engine directly, which
+    only blocks this request's own loop; otherwise it goes through the async engine.
+    """
+    if WEB_EVENT_LOOP == 'sync':
+        with sync_session() as session:
+            return func(session, *args)
+    async with async_session() as session:
+        return await session.run_sync(func, *args)
+instrument_engine(engine, 'web')
+instrument_engine(sync_engine, 'web_sync')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def load_current_user():
+    # Load the user here, on the request's own thread, instead of lazily from
+    # a view on the shared event loop, where the blocking query would stall
+    # every other request.
+    current_user._get_current_object()
+
+@app.after_request
+def record_request_time(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        observe_request(route, request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    # Only for a Prometheus scraping from this host, or the admin: it lists every route and query.
+    if not ipaddress.ip_address(request.remote_addr or '0.0.0.0').is_loopback \
+            and getattr(current_user, 'username', None) != 'admin':
+        abort(403)
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
 
-class User(UserMixin, Base):
-    __tablename__ = 'user'
-    id = Column(Integer, primary_key=True)
-    username = Column(String(80), unique=True, nullable=False)
-    password_hash = Column(String(120), nullable=False)
+@app.route('/metrics/profiler', methods=['POST'])
+@login_required
+def toggle_profiler():
+    if current_user.username != 'admin':
+        abort(403)
+    if request.form.get('action') == 'start':
+        started = profiler.start(request.form.get('interval', 0.005, type=float))
+        return Response("Profiler started.\n" if started else "Profiler is already running.\n", mimetype='text/plain')
+    return Response(profiler.stop(), mimetype='text/plain')
 
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+# Flask-Login calls this synchronously on every request, so it reads through the
+# blocking engine, and each worker keeps the user for SESSION_CACHE_TTL seconds.
+user_sessions = SessionCache(ttl=int(os.getenv('SESSION_CACHE_TTL', 60)))
 
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+def fetch_user(user_id):
+    with sync_session() as session:
+        return session.get(User, user_id)
 
 @login_manager.user_loader
-async def load_user(user_id):
-    async with async_session() as session:
-        result = await session.execute(select(User).filter_by(id=int(user_id)))
-        return result.scalars().first()
-
-class Video(Base):
-    __tablename__ = 'video'
-    id = Column(Integer, primary_key=True)
-    title = Column(String(100), nullable=False)
-    description = Column(Text, nullable=False)
-    maker = Column(String(100), nullable=False)
-    editor = Column(String(100))
-    thumbnail_maker = Column(String(100))
-    edited_path = Column(String(200))
-    thumbnail_path = Column(String(200))
-    gdrive_link = Column(String(200), nullable=False)
-    status = Column(String(50), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-class Comment(Base):
-    __tablename__ = 'comment'
-    id = Column(Integer, primary_key=True)
-    content = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    user_id = Column(Integer, ForeignKey('user.id'), nullable=False)
-    video_id = Column(Integer, ForeignKey('video.id'), nullable=False)
-
-    user = relationship('User', backref='comments')
-    video = relationship('Video', backref='comments')
-
-async def create_admin_user():
-    async with async_session() as session:
-        result = await session.execute(select(User).filter_by(username='admin'))
-        admin = result.scalars().first()
-        if not admin:
-            admin = User(username='admin')
-            admin.set_password('admin_password')  # Change this to a secure password
-            session.add(admin)
-            await session.commit()
+def load_user(user_id):
+    return user_sessions.get(int(user_id), fetch_user)
+
+@app.errorhandler(CredentialServiceBusy)
+def credential_service_busy(e):
+    return Response("Too many sign-ins at once, please try again in a moment.\n", status=503,
+                    mimetype='text/plain', headers={'Retry-After': '1'})
 
 class ConfigForm(FlaskForm):
     github_username = StringField('GitHub Username', validators=[DataRequired()])
@@ -109,7 +177,7 @@ class ConfigForm(FlaskForm):
     thumbnail_channel_id = StringField('Thumbnail Channel ID', validators=[DataRequired()])
     github_issues_channel_id = StringField('GitHub Issues Channel ID', validators=[DataRequired()])
     trusted_role_id = StringField('Trusted Role ID', validators=[DataRequired()])
-    github_token = StringField('GitHub Token', validators=[DataRequired()])
+    github_token = PasswordField('GitHub Token', validators=[Optional()])
     youtube_token_path = StringField('YouTube Token Path', validators=[DataRequired()])
     submit = SubmitField('Save Configuration')
 
@@ -134,36 +202,23 @@ class VideoSubmissionForm(FlaskForm):
     gdrive_link = StringField('Google Drive Link', validators=[DataRequired(), URL()])
     submit = SubmitField('Submit Video')
 
-def load_config():
-    config = {
-        'github_username': os.getenv('GITHUB_USERNAME', ''),
-        'editor_channel_id': os.getenv('EDITOR_CHANNEL_ID', ''),
-        'thumbnail_channel_id': os.getenv('THUMBNAIL_CHANNEL_ID', ''),
-        'github_issues_channel_id': os.getenv('GITHUB_ISSUES_CHANNEL_ID', ''),
-        'trusted_role_id': os.getenv('TRUSTED_ROLE_ID', ''),
-        'github_token': os.getenv('GITHUB_TOKEN', ''),
-        'youtube_token_path': os.getenv('YOUTUBE_TOKEN_PATH', '')
-    }
-    return {k: v for k, v in config.items() if v}  # Remove empty values
-
-def save_config(config):
-    for key, value in config.items():
-        os.environ[key.upper()] = value
+def index_rows(session, offset, limit):
+    videos = session.execute(select(Video).order_by(Video.created_at.desc()).offset(offset).limit(limit)).scalars().all()
+    return videos, session.execute(select(func.count(Video.id))).scalar()
 
 @app.route('/')
 async def index():
     page, per_page, offset = get_page_args(page_parameter='page', per_page_parameter='per_page')
-    async with async_session() as session:
-        result = await session.execute(select(Video).order_by(Video.created_at.desc()).offset(offset).limit(per_page))
-        videos = result.scalars().all()
-        total = await session.execute(select(func.count(Video.id)))
-        total = total.scalar()
+    videos, total = await read(index_rows, offset, per_page)
     pagination = Pagination(page=page, per_page=per_page, total=total, css_framework='bootstrap4')
-    config = load_config()
+    config = config_store.as_dict()
     return render_template('index.html', videos=videos, pagination=pagination, config=config, current_user=current_user)
 
 @app.route('/config', methods=['GET', 'POST'])
+@login_required
 async def config():
+    if current_user.username != 'admin':
+        abort(403)
     form = ConfigForm()
     if form.validate_on_submit():
         config = {
@@ -172,88 +227,214 @@ async def config():
             'thumbnail_channel_id': form.thumbnail_channel_id.data,
             'github_issues_channel_id': form.github_issues_channel_id.data,
             'trusted_role_id': form.trusted_role_id.data,
-            'github_token': form.github_token.data,
             'youtube_token_path': form.youtube_token_path.data
         }
-        save_config(config)
+        if form.github_token.data:
+            config['github_token'] = form.github_token.data
+        await config_store.update_async(config)
         flash('Configuration updated successfully!', 'success')
         return redirect(url_for('index'))
     
-    config = load_config()
+    config = config_store.as_dict()
     form.github_username.data = config.get('github_username', '')
     form.editor_channel_id.data = config.get('editor_channel_id', '')
     form.thumbnail_channel_id.data = config.get('thumbnail_channel_id', '')
     form.github_issues_channel_id.data = config.get('github_issues_channel_id', '')
     form.trusted_role_id.data = config.get('trusted_role_id', '')
-    form.github_token.data = config.get('github_token', '')
     form.youtube_token_path.data = config.get('youtube_token_path', '')
     return render_template('config.html', form=form)
 
-@app.route('/video/<int:id>')
+COMMENTS_PER_PAGE = 20
+
+def video_detail_validators(row, page, per_page):
+    video = row.Video
+    last_modified = max(filter(None, [video.created_at, video.updated_at, row.last_comment_at]))
+    last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+    # The page embeds the viewer's name and a CSRF token, so the tag is per user
+    # and rolls over well inside the token's lifetime.
+    csrf_window = int(time.time() // ((app.config['WTF_CSRF_TIME_LIMIT'] or 3600) / 2))
+    fingerprint = f"{video.id}|{video.updated_at}|{row.comment_count}|{row.last_comment_at}|{page}|{per_page}|{current_user.get_id()}|{csrf_window}"
+    return hashlib.sha1(fingerprint.encode()).hexdigest(), last_modified
+
+def not_modified(etag, last_modified):
+    if request.if_none_match:
+        return etag in request.if_none_match
+    return request.if_modified_since is not None and last_modified <= request.if_modified_since
+
+@app.route('/video/<int:id>', methods=['GET', 'POST'])
 async def video_detail(id):
-    async with async_session() as session:
-        result = await session.execute(select(Video).filter_by(id=id))
-        video = result.scalars().first()
-    if not video:
-        abort(404)
+    page, per_page, offset = get_page_args(page_parameter='page', per_page_parameter='per_page')
+    per_page = min(per_page, COMMENTS_PER_PAGE)
+    offset = (page - 1) * per_page
     form = CommentForm()
-    if form.validate_on_submit():
-        async with async_session() as session:
-            comment = Comment(content=form.content.data, user_id=current_user.id, video_id=video.id)
-            session.add(comment)
+    async with async_session() as session:
+        row = await get_video_with_comment_stats(session, id)
+        if row is None:
+            abort(404)
+        video = row.Video
+        if form.validate_on_submit():
+            if not current_user.is_authenticated:
+                return login_manager.unauthorized()
+            session.add(Comment(content=form.content.data, user_id=current_user.id, video_id=video.id))
             await session.commit()
-        flash('Your comment has been posted!', 'success')
-        return redirect(url_for('video_detail', id=video.id))
-    return render_template('video_detail.html', title=video.title, video=video, form=form)
+            flash('Your comment has been posted!', 'success')
+            return redirect(url_for('video_detail', id=video.id))
+
+        etag, last_modified = video_detail_validators(row, page, per_page)
+        if request.method == 'GET' and not_modified(etag, last_modified):
+            response = Response(status=304)
+        else:
+            comments = []
+            if row.comment_count > offset:
+                comments = await get_comment_page(session, video.id, offset, per_page)
+            response = None
+
+    if response is None:
+        pagination = Pagination(page=page, per_page=per_page, total=row.comment_count, css_framework='bootstrap4')
+        response = make_response(render_template('video_detail.html', title=video.title, video=video,
+                                                 comments=comments, pagination=pagination, form=form))
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+API_PAGE_DEFAULT = 50
+API_PAGE_MAX = 500
+
+def small_thumbnail_url():
+    # Resolved once per response: the NDJSON export formats rows after the view has
+    # returned, outside the app context that url_for needs.
+    return url_for('thumbnail', digest='DIGEST', variant='small').replace('DIGEST', '{digest}')
+
+def video_row_json(row, thumbnail_url):
+    return {
+        'id': row.id,
+        'title': row.title,
+        'status': row.status,
+        'maker': row.maker,
+        'created_at': row.created_at.isoformat(),
+        'thumbnail_url': thumbnail_url.format(digest=row.thumbnail_digest) if row.thumbnail_digest else None
+    }
+
+def videos_json(rows):
+    thumbnail_url = small_thumbnail_url()
+    return [video_row_json(row, thumbnail_url) for row in rows]
 
 @app.route('/api/videos')
 async def api_videos():
+    try:
+        after = decode_video_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        abort(400)
+    status = request.args.get('status')
+    maker = request.args.get('maker')
+
+    if request.args.get('format') == 'ndjson':
+        # Full export: rows are streamed from a server-side cursor as they are read.
+        # No limit exports everything; a bad one is rejected rather than read as "no limit".
+        limit = request.args.get('limit', type=int)
+        if 'limit' in request.args and (limit is None or limit < 1):
+            abort(400)
+        query = video_listing_query(after, status, maker, limit)
+        thumbnail_url = small_thumbnail_url()
+
+        def generate():
+            with sync_engine.connect() as conn:
+                result = conn.execution_options(stream_results=True, max_row_buffer=API_PAGE_MAX).execute(query)
+                for row in result:
+                    yield json.dumps(video_row_json(row, thumbnail_url)) + '\n'
+
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    limit = min(max(request.args.get('limit', API_PAGE_DEFAULT, type=int), 1), API_PAGE_MAX)
+    query = video_listing_query(after, status, maker, limit + 1)
+    rows = await read(lambda session: session.execute(query).all())
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_video_cursor(rows[-1].created_at, rows[-1].id)
+    return jsonify({
+        'videos': videos_json(rows),
+        'next_cursor': next_cursor
+    })
+
+SEARCH_PAGE_SIZE = 20
+
+def search_page_args():
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    return query, page, (page - 1) * SEARCH_PAGE_SIZE
+
+@app.route('/search')
+async def search():
+    query, page, offset = search_page_args()
+    results, has_more = [], False
+    if query:
+        async with async_session() as session:
+            results, has_more = await search_videos(session, query, SEARCH_PAGE_SIZE, offset)
+    return render_template('search.html', title='Search', query=query, results=results, page=page, has_more=has_more)
+
+@app.route('/api/search')
+async def api_search():
+    query, page, offset = search_page_args()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
     async with async_session() as session:
-        result = await session.execute(select(Video).order_by(Video.created_at.desc()))
-        videos = result.scalars().all()
-    return jsonify([{
-        'id': v.id,
-        'title': v.title,
-        'status': v.status,
-        'created_at': v.created_at.isoformat()
-    } for v in videos])
+        results, has_more = await search_videos(session, query, SEARCH_PAGE_SIZE, offset)
+    return jsonify({
+        'videos': videos_json(results),
+        'next_page': page + 1 if has_more else None
+    })
+
+def leaderboard_rows(session, offset, limit):
+    rows = session.execute(
+        select(MakerStats.maker, MakerStats.video_count)
+        .order_by(MakerStats.video_count.desc())
+        .offset(offset)
+        .limit(limit)
+    ).all()
+    return rows, session.execute(select(func.count()).select_from(MakerStats)).scalar()
 
 @app.route('/leaderboard')
-@cache.cached(timeout=300)  # Cache for 5 minutes
+@page_cache.cached(tags=[TAG_VIDEOS], timeout=300, vary=lambda: current_user.get_id())
 async def leaderboard():
     page, per_page, offset = get_page_args(page_parameter='page', per_page_parameter='per_page')
-    async with async_session() as session:
-        result = await session.execute(
-            select(Video.maker, func.count(Video.id).label('video_count'))
-            .group_by(Video.maker)
-            .order_by(func.count(Video.id).desc())
-        )
-        results = result.all()
-    total = len(results)
-    pagination_results = results[offset: offset + per_page]
+    pagination_results, total = await read(leaderboard_rows, offset, per_page)
     pagination = Pagination(page=page, per_page=per_page, total=total, css_framework='bootstrap4')
     return render_template('leaderboard.html', results=pagination_results, pagination=pagination, enumerate=enumerate)
 
+def parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400)
+
 @app.route('/analytics')
 @login_required
-@cache.cached(timeout=3600)  # Cache for 1 hour
+@page_cache.cached(tags=[TAG_VIDEOS], timeout=3600, vary=lambda: current_user.get_id())
 async def analytics():
+    import plotly.graph_objects as go
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        abort(400)
+    start, end = parse_date_arg('start'), parse_date_arg('end')
     async with async_session() as session:
-        result = await session.execute(select(Video))
-        videos = result.scalars().all()
-    df = pd.DataFrame([(v.created_at, v.status) for v in videos], columns=['date', 'status'])
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.set_index('date')
-    df = df.resample('D').count().reset_index()
-
-    fig = px.line(df, x='date', y='status', title='Video Submissions Over Time')
+        submissions = await submission_counts(session, bucket, start, end)
+        statuses = await status_counts(session, start, end)
+
+    fig = go.Figure(go.Scatter(x=submissions['buckets'], y=submissions['counts'], mode='lines'))
+    fig.update_layout(title='Video Submissions Over Time')
     graph_json = fig.to_json()
 
-    status_counts = [(v.status, df[df['status'] == v.status].shape[0]) for v in videos]
-    status_fig = px.pie(values=[count for _, count in status_counts], names=[status for status, _ in status_counts], title='Video Status Distribution')
+    status_fig = go.Figure(go.Pie(values=statuses['counts'], labels=statuses['statuses']))
+    status_fig.update_layout(title='Video Status Distribution')
     status_graph_json = status_fig.to_json()
 
-    return render_template('analytics.html', line_graph=graph_json, pie_graph=status_graph_json)
+    return render_template('analytics.html', line_graph=graph_json, pie_graph=status_graph_json,
+                           buckets=BUCKETS, bucket=bucket, start=start, end=end)
 
 @app.route('/video/<int:id>/preview')
 async def video_preview(id):
@@ -264,6 +445,25 @@ async def video_preview(id):
         abort(404)
     return render_template('video_preview.html', video=video)
 
+# Renditions are made by the pipeline's thumbnail stage; a request only ever
+# reads a file. A URL names fixed content, so browsers may keep it for a year.
+@app.route('/thumbnails/<digest>/<variant>.jpg')
+async def thumbnail(digest, variant):
+    if variant not in WEB_VARIANTS or not DIGEST.fullmatch(digest):
+        abort(404)
+    path = cached_variant(digest, variant)
+    if path is None:
+        # Evicted: rebuild it in the background for the next page load.
+        async with async_session() as session:
+            result = await session.execute(select(Video.thumbnail_path).filter_by(thumbnail_digest=digest).limit(1))
+            source_path = result.scalar()
+        if source_path:
+            refresh_in_background(digest, source_path)
+        abort(404)
+    response = send_file(os.path.abspath(path), mimetype='image/jpeg', etag=f"{digest}-{variant}", max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 @app.route('/login', methods=['GET', 'POST'])
 async def login():
     form = LoginForm()
@@ -271,12 +471,29 @@ async def login():
         async with async_session() as session:
             result = await session.execute(select(User).filter_by(username=form.username.data))
             user = result.scalars().first()
-        if user and user.check_password(form.password.data):
+        if user and await verify_password(form.password.data, user.password_hash):
+            if needs_rehash(user.password_hash):
+                await upgrade_password_hash(user, form.password.data)
             login_user(user)
             return redirect(url_for('index'))
         flash('Invalid username or password', 'error')
     return render_template('login.html', form=form)
 
+async def upgrade_password_hash(user, password):
+    """Store a new hash for user's (just verified) password with the current BCRYPT_ROUNDS."""
+    try:
+        password_hash = await hash_password(password)
+    except CredentialServiceBusy:
+        return  # Next login will try again.
+    async with async_session() as session:
+        await session.execute(
+            update(User).where(User.id == user.id, User.password_hash == user.password_hash)
+            .values(password_hash=password_hash)
+        )
+        await session.commit()
+    user.password_hash = password_hash
+    user_sessions.invalidate(user.id)
+
 @app.route('/logout')
 @login_required
 async def logout():
@@ -295,8 +512,7 @@ async def register():
         if user:
             flash('Username already exists. Please choose a different one.', 'danger')
             return redirect(url_for('register'))
-        new_user = User(username=form.username.data)
-        new_user.set_password(form.password.data)
+        new_user = User(username=form.username.data, password_hash=await hash_password(form.password.data))
         async with async_session() as session:
             session.add(new_user)
             await session.commit()
@@ -307,16 +523,19 @@ async def register():
 @app.route('/video/<int:id>/delete', methods=['POST'])
 @login_required
 async def delete_video(id):
-    async with async_session() as session:
-        result = await session.execute(select(Video).filter_by(id=id))
-        video = result.scalars().first()
-    if not video:
-        abort(404)
     if current_user.username != 'admin':
         abort(403)
     async with async_session() as session:
-        await session.delete(video)
+        maker = (await session.execute(select(Video.maker).where(Video.id == id))).scalar()
+        if maker is None:
+            abort(404)
+        # Plain DELETEs, so the session never has to load the video's comments to unlink them.
+        await session.execute(delete(Comment).where(Comment.video_id == id))
+        await session.execute(delete(Job).where(Job.video_id == id))
+        await session.execute(delete(Video).where(Video.id == id))
+        await record_video_removed(session, maker)
         await session.commit()
+    page_cache.invalidate(TAG_VIDEOS)
     flash('Video has been deleted.', 'success')
     return redirect(url_for('index'))
 
@@ -334,15 +553,13 @@ async def submit_video():
         )
         async with async_session() as session:
             session.add(new_video)
+            await record_video_added(session, new_video.maker)
             await session.commit()
+        page_cache.invalidate(TAG_VIDEOS)
         flash('Your video has been submitted successfully!', 'success')
         return redirect(url_for('index'))
     return render_template('submit_video.html', form=form, title='Submit Video')
 
-with app.app_context():
-    db.create_all()
-    asyncio.run(create_admin_user())
-
 def run_bot():
     # Import the bot code here to avoid circular imports
     from bot import run_discord_bot
@@ -0,0 +1,201 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+import httplib2
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload
+
+YOUTUBE_UPLOAD_SCOPE = 'https://www.googleapis.com/auth/youtube.upload'
+SESSIONS_PATH = 'upload_sessions.json'
+
+# Resumable upload chunks must be a multiple of 256 KiB.
+CHUNK_GRANULARITY = 256 * 1024
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_RETRIES = 10
+RETRIABLE_STATUS_CODES = (500, 502, 503, 504)
+RETRIABLE_EXCEPTIONS = (httplib2.HttpLib2Error, ConnectionError, socket.timeout, TimeoutError)
+
+def chunk_size_from_env():
+    size = int(os.getenv('YOUTUBE_UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+    return max(CHUNK_GRANULARITY, size - size % CHUNK_GRANULARITY)
+
+def build_youtube_client(token_path, api_endpoint=None):
+    # api_endpoint points the client at another server, e.g. a local fake upload endpoint.
+    credentials = Credentials.from_authorized_user_file(token_path, [YOUTUBE_UPLOAD_SCOPE])
+    client_options = {'api_endpoint': api_endpoint} if api_endpoint else None
+    return build('youtube', 'v3', credentials=credentials, client_options=client_options, static_discovery=True)
+
+class UploadSessionStore:
+    """Persists resumable upload session URIs so an interrupted upload can continue after a restart."""
+
+    def __init__(self, path=SESSIONS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        return {}
+
+    def _write(self, sessions):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(sessions, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key):
+        with self._lock:
+            return self._read().get(str(key))
+
+    def put(self, key, session):
+        with self._lock:
+            sessions = self._read()
+            sessions[str(key)] = session
+            self._write(sessions)
+
+    def remove(self, key):
+        with self._lock:
+            sessions = self._read()
+            if sessions.pop(str(key), None) is not None:
+                self._write(sessions)
+
+class UploadStats:
+    def __init__(self, key, path, total_bytes):
+        self.key = key
+        self.path = path
+        self.total_bytes = total_bytes
+        self.bytes_sent = 0
+        self.resumed_from = 0
+        self.retries = 0
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def progress(self):
+        return self.bytes_sent / self.total_bytes if self.total_bytes else 1.0
+
+    @property
+    def throughput(self):
+        # Bytes per second actually transferred in this run, excluding a resumed prefix.
+        return (self.bytes_sent - self.resumed_from) / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'key': self.key,
+            'path': self.path,
+            'total_bytes': self.total_bytes,
+            'bytes_sent': self.bytes_sent,
+            'resumed_from': self.resumed_from,
+            'retries': self.retries,
+            'elapsed': round(self.elapsed, 3),
+            'throughput_bytes_per_sec': round(self.throughput, 1),
+        }
+
+def _session_progress(request, size):
+    """Ask the server how much of request's resumable session it already has.
+
+    Returns (bytes received, None), or (size, response) if the upload had finished.
+    """
+    resp, content = request.http.request(request.resumable_uri, 'PUT',
+                                         headers={'Content-Range': f'bytes */{size}', 'Content-Length': '0'})
+    if resp.status in (200, 201):
+        return size, request.postproc(resp, content)
+    if resp.status != 308:
+        raise HttpError(resp, content, uri=request.resumable_uri)
+    return (int(resp['range'].split('-')[1]) + 1 if 'range' in resp else 0), None
+
+def resumable_upload(request, key, path, store, stats, on_progress=None, max_retries=MAX_RETRIES):
+    """Drive a resumable googleapiclient request to completion, retrying chunk failures with backoff."""
+    saved = store.get(key)
+    resuming = False
+    if saved and saved['path'] == path and saved['size'] == stats.total_bytes:
+        if 'response' in saved:
+            # Finished before a crash; do not upload the file a second time.
+            stats.resumed_from = stats.bytes_sent = stats.total_bytes
+            stats.finished_at = time.monotonic()
+            return saved['response']
+        request.resumable_uri = saved['uri']
+        resuming = True
+
+    response = None
+    retry = 0
+    while response is None:
+        try:
+            if resuming:
+                # Ask the server how much of the file it already has before sending more.
+                progress, response = _session_progress(request, stats.total_bytes)
+                request.resumable_progress = stats.resumed_from = stats.bytes_sent = progress
+                resuming = False
+                continue
+            status, response = request.next_chunk()
+        except HttpError as e:
+            if e.resp.status in (404, 410):
+                # The session expired server-side; start the file again.
+                store.remove(key)
+                request.resumable_uri = None
+                request.resumable_progress = 0
+                resuming = False
+            elif e.resp.status not in RETRIABLE_STATUS_CODES:
+                raise
+            error = e
+        except RETRIABLE_EXCEPTIONS as e:
+            error = e
+        else:
+            error = None
+            retry = 0
+            if request.resumable_uri and (saved is None or saved['uri'] != request.resumable_uri):
+                saved = {'uri': request.resumable_uri, 'path': path, 'size': stats.total_bytes}
+                store.put(key, saved)
+            if status is not None:
+                stats.bytes_sent = status.resumable_progress
+                if on_progress:
+                    on_progress(stats)
+
+        if error is not None:
+            retry += 1
+            stats.retries += 1
+            if retry > max_retries:
+                raise error
+            time.sleep(min(random.random() * 2 ** retry, 64))
+
+    stats.bytes_sent = stats.total_bytes
+    stats.finished_at = time.monotonic()
+    # Kept until the caller has recorded the video id, so a crash in between
+    # does not upload the file again.
+    store.put(key, {'path': path, 'size': stats.total_bytes, 'response': {'id': response.get('id')}})
+    if on_progress:
+        on_progress(stats)
+    return response
+
+def upload_video(youtube, key, path, body, thumbnail_path=None, chunk_size=None,
+                 store=None, on_progress=None):
+    """Upload a video (and optional thumbnail) with resumable chunked requests.
+
+    Blocking; meant to run in a worker thread. Returns (video_id, UploadStats).
+    """
+    store = store or UploadSessionStore()
+    chunk_size = chunk_size or chunk_size_from_env()
+    stats = UploadStats(key, path, os.path.getsize(path))
+
+    media = MediaFileUpload(path, chunksize=chunk_size, resumable=True)
+    request = youtube.videos().insert(part='snippet,status', body=body, media_body=media)
+    response = resumable_upload(request, key, path, store, stats, on_progress)
+    video_id = response.get('id')
+
+    if thumbnail_path:
+        youtube.thumbnails().set(
+            videoId=video_id,
+            media_body=MediaFileUpload(thumbnail_path)
+        ).execute(num_retries=MAX_RETRIES)
+
+    return video_id, stats